@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
 
 from models import Base
+from settings import database_settings
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -24,7 +25,8 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
-config.set_main_option("sqlalchemy.url", "postgresql+asyncpg://admin:admin123@db:5432/computer_store")
+# Тот же DSN, что и у приложения; % экранируется для configparser
+config.set_main_option("sqlalchemy.url", database_settings.url.replace("%", "%%"))
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -0,0 +1,31 @@
+"""add admin order search indexes
+
+Revision ID: 0a4c6e8f1b37
+Revises: f3b7d1e9a048
+Create Date: 2026-10-19 14:41:26.358120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a4c6e8f1b37'
+down_revision: Union[str, None] = 'f3b7d1e9a048'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индекс на партиционированной orders создается во всех партициях
+    op.create_index('ix_orders_status_created_at', 'orders', ['status', 'created_at'], unique=False)
+    op.create_index(op.f('ix_order_product_product_id'), 'order_product', ['product_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_order_product_product_id'), table_name='order_product')
+    op.drop_index('ix_orders_status_created_at', table_name='orders')
@@ -0,0 +1,34 @@
+"""add review listing indexes
+
+Revision ID: 1b5d7f9a2c48
+Revises: 0a4c6e8f1b37
+Create Date: 2026-10-19 15:10:48.904613
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b5d7f9a2c48'
+down_revision: Union[str, None] = '0a4c6e8f1b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # created_at входит в курсор ленты отзывов и не может быть NULL
+    op.execute("UPDATE reviews SET created_at = coalesce(updated_at, now()) WHERE created_at IS NULL")
+    op.alter_column('reviews', 'created_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+    op.create_index('ix_reviews_product_id_created_at_id', 'reviews', ['product_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_reviews_product_id_rating', 'reviews', ['product_id', 'rating', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reviews_product_id_rating', table_name='reviews')
+    op.drop_index('ix_reviews_product_id_created_at_id', table_name='reviews')
+    op.alter_column('reviews', 'created_at', existing_type=sa.DateTime(timezone=True), nullable=True)
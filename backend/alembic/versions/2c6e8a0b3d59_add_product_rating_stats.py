@@ -0,0 +1,55 @@
+"""add product rating stats
+
+Revision ID: 2c6e8a0b3d59
+Revises: 1b5d7f9a2c48
+Create Date: 2026-10-19 15:37:02.416895
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c6e8a0b3d59'
+down_revision: Union[str, None] = '1b5d7f9a2c48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('product_rating_stats',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('rating_1', sa.Integer(), nullable=False),
+    sa.Column('rating_2', sa.Integer(), nullable=False),
+    sa.Column('rating_3', sa.Integer(), nullable=False),
+    sa.Column('rating_4', sa.Integer(), nullable=False),
+    sa.Column('rating_5', sa.Integer(), nullable=False),
+    sa.Column('review_count', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    # Заполняем счетчики по уже существующим отзывам
+    op.execute("""
+        INSERT INTO product_rating_stats
+            (product_id, rating_1, rating_2, rating_3, rating_4, rating_5, review_count, rating_sum)
+        SELECT product_id,
+               count(*) FILTER (WHERE rating = 1),
+               count(*) FILTER (WHERE rating = 2),
+               count(*) FILTER (WHERE rating = 3),
+               count(*) FILTER (WHERE rating = 4),
+               count(*) FILTER (WHERE rating = 5),
+               count(*),
+               coalesce(sum(rating), 0)
+        FROM reviews
+        WHERE rating BETWEEN 1 AND 5 AND product_id IS NOT NULL
+        GROUP BY product_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('product_rating_stats')
@@ -0,0 +1,54 @@
+"""unique review per user and product
+
+Revision ID: 3d7f9b1c4e60
+Revises: 2c6e8a0b3d59
+Create Date: 2026-10-19 16:05:33.287140
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d7f9b1c4e60'
+down_revision: Union[str, None] = '2c6e8a0b3d59'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Оставляем только последний отзыв пользователя на товар
+    op.execute("""
+        DELETE FROM reviews r
+        USING reviews newer
+        WHERE newer.user_id = r.user_id
+          AND newer.product_id = r.product_id
+          AND newer.id > r.id
+    """)
+    op.create_unique_constraint('uq_reviews_user_product', 'reviews', ['user_id', 'product_id'])
+
+    # Счетчики оценок пересчитываются после удаления дублей
+    op.execute("DELETE FROM product_rating_stats")
+    op.execute("""
+        INSERT INTO product_rating_stats
+            (product_id, rating_1, rating_2, rating_3, rating_4, rating_5, review_count, rating_sum)
+        SELECT product_id,
+               count(*) FILTER (WHERE rating = 1),
+               count(*) FILTER (WHERE rating = 2),
+               count(*) FILTER (WHERE rating = 3),
+               count(*) FILTER (WHERE rating = 4),
+               count(*) FILTER (WHERE rating = 5),
+               count(*),
+               coalesce(sum(rating), 0)
+        FROM reviews
+        WHERE rating BETWEEN 1 AND 5 AND product_id IS NOT NULL
+        GROUP BY product_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_reviews_user_product', 'reviews', type_='unique')
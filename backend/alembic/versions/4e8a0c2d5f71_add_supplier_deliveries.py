@@ -0,0 +1,52 @@
+"""add supplier deliveries
+
+Revision ID: 4e8a0c2d5f71
+Revises: 3d7f9b1c4e60
+Create Date: 2026-10-19 16:44:19.653027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8a0c2d5f71'
+down_revision: Union[str, None] = '3d7f9b1c4e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('supplier_deliveries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('supplier_id', sa.Integer(), nullable=False),
+    sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('line_count', sa.Integer(), nullable=False),
+    sa.Column('matched_count', sa.Integer(), nullable=False),
+    sa.Column('total_cost', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['supplier_id'], ['suppliers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_supplier_deliveries_id'), 'supplier_deliveries', ['id'], unique=False)
+    op.create_index(op.f('ix_supplier_deliveries_supplier_id'), 'supplier_deliveries', ['supplier_id'], unique=False)
+    op.create_table('supplier_delivery_lines',
+    sa.Column('delivery_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('supply_price', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['delivery_id'], ['supplier_deliveries.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('delivery_id', 'product_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('supplier_delivery_lines')
+    op.drop_index(op.f('ix_supplier_deliveries_supplier_id'), table_name='supplier_deliveries')
+    op.drop_index(op.f('ix_supplier_deliveries_id'), table_name='supplier_deliveries')
+    op.drop_table('supplier_deliveries')
@@ -0,0 +1,43 @@
+"""add reorder suggestions
+
+Revision ID: 5f9c1e3a7b82
+Revises: 4e8a0c2d5f71
+Create Date: 2026-10-19 17:21:36.104518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f9c1e3a7b82'
+down_revision: Union[str, None] = '4e8a0c2d5f71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reorder_suggestions',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('supplier_id', sa.Integer(), nullable=False),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.Column('daily_velocity', sa.Float(), nullable=False),
+    sa.Column('lead_time_days', sa.Float(), nullable=False),
+    sa.Column('reorder_point', sa.Float(), nullable=False),
+    sa.Column('suggested_quantity', sa.Integer(), nullable=False),
+    sa.Column('days_of_cover', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['supplier_id'], ['suppliers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_index(op.f('ix_reorder_suggestions_supplier_id'), 'reorder_suggestions', ['supplier_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_reorder_suggestions_supplier_id'), table_name='reorder_suggestions')
+    op.drop_table('reorder_suggestions')
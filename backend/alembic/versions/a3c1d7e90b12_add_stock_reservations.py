@@ -0,0 +1,43 @@
+"""add stock reservations
+
+Revision ID: a3c1d7e90b12
+Revises: f0b49d9b53fe
+Create Date: 2026-10-19 10:12:41.507215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c1d7e90b12'
+down_revision: Union[str, None] = 'f0b49d9b53fe'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stock_reservations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'product_id', name='uq_stock_reservations_user_product')
+    )
+    op.create_index(op.f('ix_stock_reservations_id'), 'stock_reservations', ['id'], unique=False)
+    op.create_index(op.f('ix_stock_reservations_expires_at'), 'stock_reservations', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_stock_reservations_expires_at'), table_name='stock_reservations')
+    op.drop_index(op.f('ix_stock_reservations_id'), table_name='stock_reservations')
+    op.drop_table('stock_reservations')
@@ -0,0 +1,28 @@
+"""add orders (user_id, created_at) index
+
+Revision ID: c5d9a0e3f214
+Revises: b7e4f2a61c03
+Create Date: 2026-10-19 11:48:52.118306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d9a0e3f214'
+down_revision: Union[str, None] = 'b7e4f2a61c03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_user_id_created_at', table_name='orders')
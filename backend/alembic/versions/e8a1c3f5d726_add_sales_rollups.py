@@ -0,0 +1,84 @@
+"""add sales rollups
+
+Revision ID: e8a1c3f5d726
+Revises: d2f6b8c47a95
+Create Date: 2026-10-19 13:14:39.602217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a1c3f5d726'
+down_revision: Union[str, None] = 'd2f6b8c47a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _counters() -> list:
+    return [
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    *_counters(),
+    sa.PrimaryKeyConstraint('day')
+    )
+    for table, key in (
+        ('sales_daily_product', 'product_id'),
+        ('sales_daily_category', 'category_id'),
+        ('sales_daily_supplier', 'supplier_id'),
+    ):
+        op.create_table(table,
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column(key, sa.Integer(), nullable=False),
+        *_counters(),
+        sa.PrimaryKeyConstraint('day', key)
+        )
+        op.create_index(op.f(f'ix_{table}_{key}'), table, [key], unique=False)
+
+    # Первичное заполнение агрегатов из уже существующих заказов
+    op.execute("""
+        INSERT INTO sales_daily (day, orders, units, revenue)
+        SELECT (o.created_at AT TIME ZONE 'UTC')::date, count(DISTINCT o.id), sum(op.quantity),
+               sum(op.quantity * op.price_at_time)
+        FROM orders o JOIN order_product op ON op.order_id = o.id
+        WHERE o.created_at IS NOT NULL
+        GROUP BY (o.created_at AT TIME ZONE 'UTC')::date
+    """)
+    for table, key, source in (
+        ('sales_daily_product', 'product_id', 'op.product_id'),
+        ('sales_daily_category', 'category_id', 'p.category_id'),
+        ('sales_daily_supplier', 'supplier_id', 'p.supplier_id'),
+    ):
+        op.execute(f"""
+            INSERT INTO {table} (day, {key}, orders, units, revenue)
+            SELECT (o.created_at AT TIME ZONE 'UTC')::date, {source}, count(DISTINCT o.id), sum(op.quantity),
+                   sum(op.quantity * op.price_at_time)
+            FROM orders o
+            JOIN order_product op ON op.order_id = o.id
+            JOIN products p ON p.id = op.product_id
+            WHERE o.created_at IS NOT NULL AND {source} IS NOT NULL
+            GROUP BY (o.created_at AT TIME ZONE 'UTC')::date, {source}
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, key in (
+        ('sales_daily_supplier', 'supplier_id'),
+        ('sales_daily_category', 'category_id'),
+        ('sales_daily_product', 'product_id'),
+    ):
+        op.drop_index(op.f(f'ix_{table}_{key}'), table_name=table)
+        op.drop_table(table)
+    op.drop_table('sales_daily')
@@ -0,0 +1,169 @@
+"""partition orders by created_at
+
+Revision ID: f3b7d1e9a048
+Revises: e8a1c3f5d726
+Create Date: 2026-10-19 14:02:11.730954
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b7d1e9a048'
+down_revision: Union[str, None] = 'e8a1c3f5d726'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько месяцев вперед создать партиции сразу
+MONTHS_AHEAD = 3
+# Строк за одну транзакцию при переносе заказов
+BATCH_SIZE = 10000
+
+COLUMNS = "id, user_id, status, total_amount, shipping_address, created_at, updated_at"
+# Колонки, которые приложение меняет у существующих заказов
+MUTABLE = ("user_id", "status", "total_amount", "shipping_address", "created_at", "updated_at")
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _copy_in_batches(source: str, target: str) -> None:
+    """
+    Копирует source в target пачками по id, каждая пачка — своя транзакция:
+    блокировки и WAL не копятся на всю таблицу. Повторный запуск продолжает
+    с наибольшего уже скопированного id.
+    """
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        last_id = conn.execute(sa.text(f"SELECT coalesce(max(id), 0) FROM {target}")).scalar()
+        while last_id is not None:
+            last_id = conn.execute(
+                sa.text(f"""
+                    WITH batch AS (
+                        SELECT {COLUMNS} FROM {source} WHERE id > :last_id ORDER BY id LIMIT :batch_size
+                    ), copied AS (
+                        INSERT INTO {target} ({COLUMNS}) SELECT {COLUMNS} FROM batch
+                    )
+                    SELECT max(id) FROM batch
+                """),
+                {"last_id": last_id, "batch_size": BATCH_SIZE}
+            ).scalar()
+
+
+def _catch_up_and_swap(source: str, target: str) -> None:
+    """
+    В транзакции миграции под эксклюзивной блокировкой source: дозаписать заказы,
+    созданные, измененные или удаленные за время копирования, и поставить target
+    на место orders. Блокировка держится на время сверки, а не полного копирования.
+    """
+    changed = ", ".join(f"t.{column}" for column in MUTABLE)
+    current = ", ".join(f"s.{column}" for column in MUTABLE)
+    op.execute(f"LOCK TABLE {source} IN ACCESS EXCLUSIVE MODE")
+    op.execute(f"""
+        INSERT INTO {target} ({COLUMNS})
+        SELECT {COLUMNS} FROM {source} s
+        WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE t.id = s.id)
+    """)
+    op.execute(f"""
+        UPDATE {target} t SET {", ".join(f"{column} = s.{column}" for column in MUTABLE)}
+        FROM {source} s
+        WHERE t.id = s.id AND ({changed}) IS DISTINCT FROM ({current})
+    """)
+    op.execute(f"DELETE FROM {target} t WHERE NOT EXISTS (SELECT 1 FROM {source} s WHERE s.id = t.id)")
+
+    # Последовательность переходит к новой таблице, иначе удалится вместе со старой
+    op.execute(f"ALTER SEQUENCE orders_id_seq OWNED BY {target}.id")
+    op.execute(f"DROP TABLE {source}")
+    op.execute(f"ALTER TABLE {target} RENAME TO orders")
+    op.execute(f"ALTER TABLE orders RENAME CONSTRAINT {target}_pkey TO orders_pkey")
+    op.execute(f"ALTER INDEX ix_{target}_id RENAME TO ix_orders_id")
+    op.execute(f"ALTER INDEX ix_{target}_user_id_created_at RENAME TO ix_orders_user_id_created_at")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+
+    # created_at становится ключом партиционирования и не может быть NULL
+    op.execute("UPDATE orders SET created_at = coalesce(updated_at, now()) WHERE created_at IS NULL")
+
+    # Новая таблица строится рядом со старой; IF NOT EXISTS — чтобы миграцию,
+    # прерванную во время копирования, можно было запустить повторно
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS orders_partitioned (
+            id INTEGER NOT NULL DEFAULT nextval('orders_id_seq'),
+            user_id INTEGER REFERENCES users (id),
+            status VARCHAR,
+            total_amount FLOAT,
+            shipping_address VARCHAR,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE,
+            CONSTRAINT orders_partitioned_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_partitioned_id ON orders_partitioned (id)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_orders_partitioned_user_id_created_at "
+        "ON orders_partitioned (user_id, created_at)"
+    )
+
+    # Помесячные партиции от самого старого заказа до MONTHS_AHEAD месяцев вперед
+    first = conn.execute(sa.text("SELECT min(created_at) FROM orders")).scalar()
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    month = first.astimezone(timezone.utc).date().replace(day=1) if first is not None else current
+    while month <= _add_months(current, MONTHS_AHEAD):
+        following = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS orders_p{month:%Y%m} PARTITION OF orders_partitioned "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        )
+        month = following
+    # Страховка для дат вне созданных диапазонов
+    op.execute("CREATE TABLE IF NOT EXISTS orders_default PARTITION OF orders_partitioned DEFAULT")
+
+    _copy_in_batches("orders", "orders_partitioned")
+
+    # Внешний ключ на партиционированную таблицу должен включать created_at, которого
+    # в позициях нет, — снимаем их без замены. Дальше целостность держит приложение:
+    # delete_order удаляет позиции вместе с заказом, архивация переносит их в archive
+    op.drop_constraint('order_product_order_id_fkey', 'order_product', type_='foreignkey')
+    op.drop_constraint('order_products_order_id_fkey', 'order_products', type_='foreignkey')
+    _catch_up_and_swap("orders", "orders_partitioned")
+
+    # Схема для отсоединенных старых партиций и их позиций
+    op.execute("CREATE SCHEMA IF NOT EXISTS archive")
+    op.execute("CREATE TABLE IF NOT EXISTS archive.order_product (LIKE order_product INCLUDING ALL)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS orders_unpartitioned (
+            id INTEGER NOT NULL DEFAULT nextval('orders_id_seq'),
+            user_id INTEGER REFERENCES users (id),
+            status VARCHAR,
+            total_amount FLOAT,
+            shipping_address VARCHAR,
+            created_at TIMESTAMP WITH TIME ZONE,
+            updated_at TIMESTAMP WITH TIME ZONE,
+            CONSTRAINT orders_unpartitioned_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_unpartitioned_id ON orders_unpartitioned (id)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_orders_unpartitioned_user_id_created_at "
+        "ON orders_unpartitioned (user_id, created_at)"
+    )
+
+    # Архивные заказы возвращаются в общую таблицу не автоматически
+    _copy_in_batches("orders", "orders_unpartitioned")
+    _catch_up_and_swap("orders", "orders_unpartitioned")
+
+    op.create_foreign_key('order_product_order_id_fkey', 'order_product', 'orders', ['order_id'], ['id'])
+    op.create_foreign_key('order_products_order_id_fkey', 'order_products', 'orders', ['order_id'], ['id'])
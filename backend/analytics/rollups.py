@@ -0,0 +1,156 @@
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import Date, cast, select, delete, func, distinct, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session
+from jobs.queue import job_handler
+from models import (
+    Order,
+    Product,
+    order_product,
+    SalesDaily,
+    SalesDailyProduct,
+    SalesDailyCategory,
+    SalesDailySupplier,
+)
+
+# Позиция заказа в payload задачи: (product_id, quantity, price_at_time)
+OrderLine = Tuple[int, int, float]
+
+def sales_day(moment: datetime) -> date:
+    """День агрегатов — календарный день UTC; время без пояса считается UTC"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.date()
+
+def sales_day_column(column):
+    """То же в SQL: не зависит от TimeZone сессии"""
+    return cast(func.timezone("UTC", column), Date)
+
+async def _upsert(db: AsyncSession, model, key: str, deltas: Dict[int, List[float]], day: date) -> None:
+    """INSERT ... ON CONFLICT DO UPDATE SET counter = counter + excluded.counter"""
+    if not deltas:
+        return
+    stmt = pg_insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[model.day, getattr(model, key)],
+        set_={
+            "orders": model.orders + stmt.excluded.orders,
+            "units": model.units + stmt.excluded.units,
+            "revenue": model.revenue + stmt.excluded.revenue,
+        }
+    )
+    await db.execute(stmt, [
+        {"day": day, key: entity_id, "orders": orders, "units": units, "revenue": revenue}
+        # Фиксированный порядок строк исключает взаимные блокировки параллельных задач
+        for entity_id, (orders, units, revenue) in sorted(deltas.items())
+    ])
+
+async def apply_order_delta(db: AsyncSession, day: date, lines: Iterable[OrderLine], sign: int) -> None:
+    """
+    Добавить заказ в дневные агрегаты (sign=1) или вычесть его (sign=-1).
+    Категория и поставщик берутся у товаров на момент применения: если товар
+    перенесли в другую категорию или к другому поставщику между оформлением
+    и отменой заказа, отмена вычитается уже из новых. rebuild_sales_rollups
+    тоже считает по текущим атрибутам, так что пересчет приводит агрегаты
+    к согласованному виду.
+    """
+    lines = list(lines)
+    if not lines:
+        return
+
+    stmt = select(Product.id, Product.category_id, Product.supplier_id).where(
+        Product.id.in_({product_id for product_id, _, _ in lines})
+    )
+    attributes = {row.id: row for row in (await db.execute(stmt)).all()}
+
+    # [orders, units, revenue]: заказ учитывается один раз на товар/категорию/поставщика
+    by_product = defaultdict(lambda: [sign, 0, 0.0])
+    by_category = defaultdict(lambda: [sign, 0, 0.0])
+    by_supplier = defaultdict(lambda: [sign, 0, 0.0])
+    total_units, total_revenue = 0, 0.0
+
+    for product_id, quantity, price in lines:
+        units, revenue = sign * quantity, sign * quantity * price
+        total_units += units
+        total_revenue += revenue
+        buckets = [(by_product, product_id)]
+        product = attributes.get(product_id)
+        if product is not None and product.category_id is not None:
+            buckets.append((by_category, product.category_id))
+        if product is not None and product.supplier_id is not None:
+            buckets.append((by_supplier, product.supplier_id))
+        for bucket, entity_id in buckets:
+            bucket[entity_id][1] += units
+            bucket[entity_id][2] += revenue
+
+    stmt = pg_insert(SalesDaily).values(day=day, orders=sign, units=total_units, revenue=total_revenue)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SalesDaily.day],
+        set_={
+            "orders": SalesDaily.orders + stmt.excluded.orders,
+            "units": SalesDaily.units + stmt.excluded.units,
+            "revenue": SalesDaily.revenue + stmt.excluded.revenue,
+        }
+    )
+    await db.execute(stmt)
+    await _upsert(db, SalesDailyProduct, "product_id", by_product, day)
+    await _upsert(db, SalesDailyCategory, "category_id", by_category, day)
+    await _upsert(db, SalesDailySupplier, "supplier_id", by_supplier, day)
+
+@job_handler("sales.order_placed", concurrency=2)
+async def rollup_order_placed(db: AsyncSession, payload: dict) -> None:
+    """Учесть новый заказ в агрегатах продаж"""
+    await apply_order_delta(db, date.fromisoformat(payload["day"]), payload["lines"], 1)
+
+@job_handler("sales.order_cancelled", concurrency=2)
+async def rollup_order_cancelled(db: AsyncSession, payload: dict) -> None:
+    """Вычесть отмененный заказ из агрегатов продаж"""
+    await apply_order_delta(db, date.fromisoformat(payload["day"]), payload["lines"], -1)
+
+async def rebuild_sales_rollups(db: AsyncSession) -> None:
+    """Полностью пересчитать агрегаты из orders и order_product (для бэкфилла)"""
+    for model in (SalesDaily, SalesDailyProduct, SalesDailyCategory, SalesDailySupplier):
+        await db.execute(delete(model))
+
+    day = sales_day_column(Order.created_at)
+    lines = (
+        select(Order.id, day.label("day"), order_product.c.product_id, order_product.c.quantity,
+               order_product.c.price_at_time, Product.category_id, Product.supplier_id)
+        .join(order_product, order_product.c.order_id == Order.id)
+        .join(Product, Product.id == order_product.c.product_id)
+        .where(Order.created_at.is_not(None))
+        .subquery()
+    )
+    revenue = func.sum(lines.c.quantity * lines.c.price_at_time)
+
+    await db.execute(insert(SalesDaily).from_select(
+        ["day", "orders", "units", "revenue"],
+        select(lines.c.day, func.count(distinct(lines.c.id)), func.sum(lines.c.quantity), revenue)
+        .group_by(lines.c.day)
+    ))
+    for model, key in (
+        (SalesDailyProduct, "product_id"),
+        (SalesDailyCategory, "category_id"),
+        (SalesDailySupplier, "supplier_id"),
+    ):
+        column = lines.c[key]
+        await db.execute(insert(model).from_select(
+            ["day", key, "orders", "units", "revenue"],
+            select(lines.c.day, column, func.count(distinct(lines.c.id)), func.sum(lines.c.quantity), revenue)
+            .where(column.is_not(None))
+            .group_by(lines.c.day, column)
+        ))
+    await db.commit()
+
+async def _main() -> None:
+    async with async_session() as db:
+        await rebuild_sales_rollups(db)
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,162 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, distinct
+
+from database import get_db
+from models import (
+    Category,
+    Order,
+    Product,
+    order_product,
+    SalesDaily,
+    SalesDailyProduct,
+    SalesDailyCategory,
+    SalesDailySupplier,
+)
+from auth.security import Principal, get_admin_user
+from .rollups import sales_day_column
+from .schemas import SalesPoint, SalesSeries, SalesBreakdown, SalesBreakdownRow
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+def _date_range(date_from: Optional[date], date_to: Optional[date]) -> tuple:
+    """По умолчанию — последние 30 дней; дни агрегатов считаются по UTC"""
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from must not be later than date_to"
+        )
+    return date_from, date_to
+
+@router.get("/sales", response_model=SalesSeries)
+async def get_sales_series(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    product_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    supplier_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    _: Principal = Depends(get_admin_user)
+) -> SalesSeries:
+    """
+    Дневной ряд продаж из агрегатов (только для админов).
+    Без фильтров — по магазину целиком; category_id учитывает все поддерево категорий.
+    """
+    date_from, date_to = _date_range(date_from, date_to)
+    if sum(value is not None for value in (product_id, category_id, supplier_id)) > 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use only one of product_id, category_id, supplier_id"
+        )
+
+    if product_id is not None:
+        model = SalesDailyProduct
+        stmt = select(model.day, model.orders, model.units, model.revenue).where(model.product_id == product_id)
+    elif supplier_id is not None:
+        model = SalesDailySupplier
+        stmt = select(model.day, model.orders, model.units, model.revenue).where(model.supplier_id == supplier_id)
+    elif category_id is not None:
+        root = await db.get(Category, category_id)
+        if root is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Category not found"
+            )
+        model = SalesDailyCategory
+        if root.rgt - root.lft == 1:
+            # Лист: заказы категории берутся из агрегата как есть
+            stmt = select(model.day, model.orders, model.units, model.revenue).where(model.category_id == category_id)
+        else:
+            # Поддерево nested sets: lft в пределах [root.lft, root.rgt]. Заказ с товарами
+            # из нескольких категорий поддерева учтен в каждой из них, поэтому orders
+            # не суммируется, а считается по заказам отдельно; units и revenue складываются
+            subtree_orders = await _subtree_order_counts(db, root, date_from, date_to)
+            stmt = (
+                select(model.day, func.sum(model.units), func.sum(model.revenue))
+                .join(Category, Category.id == model.category_id)
+                .where(Category.lft.between(root.lft, root.rgt), model.day.between(date_from, date_to))
+                .group_by(model.day)
+                .order_by(model.day)
+            )
+            result = await db.execute(stmt)
+            return _series(date_from, date_to, category_id=category_id, points=[
+                (day, subtree_orders.get(day, 0), units, revenue) for day, units, revenue in result.all()
+            ])
+    else:
+        model = SalesDaily
+        stmt = select(model.day, model.orders, model.units, model.revenue)
+
+    stmt = stmt.where(model.day.between(date_from, date_to)).order_by(model.day)
+    result = await db.execute(stmt)
+    return _series(
+        date_from, date_to, product_id=product_id, category_id=category_id, supplier_id=supplier_id,
+        points=result.all()
+    )
+
+def _series(date_from: date, date_to: date, points, **filters) -> SalesSeries:
+    return SalesSeries(
+        date_from=date_from,
+        date_to=date_to,
+        **filters,
+        points=[
+            SalesPoint(day=day, orders=orders, units=units, revenue=revenue)
+            for day, orders, units, revenue in points
+        ]
+    )
+
+async def _subtree_order_counts(db: AsyncSession, root: Category, date_from: date, date_to: date) -> dict:
+    """Различные заказы по дням UTC с товарами из поддерева категорий (по исходным таблицам)"""
+    day = sales_day_column(Order.created_at)
+    stmt = (
+        select(day, func.count(distinct(Order.id)))
+        .join(order_product, order_product.c.order_id == Order.id)
+        .join(Product, Product.id == order_product.c.product_id)
+        .join(Category, Category.id == Product.category_id)
+        .where(
+            Category.lft.between(root.lft, root.rgt),
+            # Границы периода по created_at отсекают лишние партиции
+            Order.created_at >= datetime.combine(date_from, time.min, tzinfo=timezone.utc),
+            Order.created_at < datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=timezone.utc),
+        )
+        .group_by(day)
+    )
+    return dict((await db.execute(stmt)).all())
+
+@router.get("/sales/breakdown", response_model=SalesBreakdown)
+async def get_sales_breakdown(
+    by: Literal["product", "category", "supplier"] = "product",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    _: Principal = Depends(get_admin_user)
+) -> SalesBreakdown:
+    """Лидеры по выручке за период: товары, категории или поставщики (только для админов)"""
+    date_from, date_to = _date_range(date_from, date_to)
+    model, key = {
+        "product": (SalesDailyProduct, SalesDailyProduct.product_id),
+        "category": (SalesDailyCategory, SalesDailyCategory.category_id),
+        "supplier": (SalesDailySupplier, SalesDailySupplier.supplier_id),
+    }[by]
+    revenue = func.sum(model.revenue)
+    stmt = (
+        select(key, func.sum(model.orders), func.sum(model.units), revenue)
+        .where(model.day.between(date_from, date_to))
+        .group_by(key)
+        .order_by(revenue.desc())
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return SalesBreakdown(
+        date_from=date_from,
+        date_to=date_to,
+        by=by,
+        rows=[
+            SalesBreakdownRow(id=entity_id, orders=orders, units=units, revenue=revenue)
+            for entity_id, orders, units, revenue in result.all()
+        ]
+    )
@@ -0,0 +1,29 @@
+from datetime import date
+from typing import List, Optional
+from pydantic import BaseModel
+
+class SalesPoint(BaseModel):
+    day: date
+    orders: int
+    units: int
+    revenue: float
+
+class SalesSeries(BaseModel):
+    date_from: date
+    date_to: date
+    product_id: Optional[int] = None
+    category_id: Optional[int] = None
+    supplier_id: Optional[int] = None
+    points: List[SalesPoint]
+
+class SalesBreakdownRow(BaseModel):
+    id: int
+    orders: int
+    units: int
+    revenue: float
+
+class SalesBreakdown(BaseModel):
+    date_from: date
+    date_to: date
+    by: str
+    rows: List[SalesBreakdownRow]
@@ -0,0 +1,79 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+T = TypeVar("T")
+
+# Стоимость bcrypt для новых хешей; хеши с другой стоимостью
+# пересчитываются при следующем успешном входе
+BCRYPT_ROUNDS = 12
+# Потоков для bcrypt: он отпускает GIL, поэтому потоки работают параллельно
+HASHING_WORKERS = 4
+# Сколько операций может ждать и выполняться одновременно, прежде чем
+# новые запросы получат 503 вместо очереди с растущими задержками
+HASHING_MAX_PENDING = 32
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+class HashingPool:
+    """
+    Ограниченный пул потоков для хеширования паролей. Цикл событий только
+    ждет результат; при переполнении очереди запрос сразу отклоняется.
+    """
+
+    def __init__(self, workers: int = HASHING_WORKERS, max_pending: int = HASHING_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0  # исключение в хешировании или отмена ожидающего запроса
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hashing")
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is temporarily overloaded, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "queued": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+hashing_pool = HashingPool()
+
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Проверить пароль. Вторым элементом возвращается новый хеш, если
+    сохраненный устарел (другая схема или стоимость), иначе None.
+    """
+    return await hashing_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    return await hashing_pool.run(pwd_context.hash, password)
@@ -0,0 +1,83 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# Как часто процесс перечитывает таблицу отзывов (в секундах) — это и есть
+# максимальная задержка отзыва, выполненного в другом процессе
+REVOCATION_REFRESH_INTERVAL = 5
+
+class RevocationList:
+    """
+    Копия таблицы revoked_tokens в памяти процесса: проверка токена не
+    делает запросов. Отзыв в этом процессе применяется сразу после коммита
+    (apply), в остальных — при следующем refresh.
+    """
+
+    def __init__(self):
+        self.jtis: Set[str] = set()
+        # user_id -> отсечка (unix-время): токены с iat раньше нее отозваны
+        self.user_cutoffs: Dict[int, float] = {}
+        self.refreshed_at: Optional[datetime] = None
+
+    def is_revoked(self, jti: str, user_id: int, issued_at: float) -> bool:
+        if jti in self.jtis:
+            return True
+        cutoff = self.user_cutoffs.get(user_id)
+        # iat хранится с точностью до миллисекунды (см. create_access_token), поэтому
+        # токен, выпущенный после отсечки, попадает под нее разве что в ту же миллисекунду
+        return cutoff is not None and issued_at < cutoff
+
+    def apply(self, entry: RevokedToken) -> None:
+        """Учесть запись об отзыве в этом процессе; вызывается после коммита"""
+        if entry.jti is not None:
+            self.jtis.add(entry.jti)
+        if entry.user_id is not None and entry.revoked_before is not None:
+            cutoff = _timestamp(entry.revoked_before)
+            self.user_cutoffs[entry.user_id] = max(cutoff, self.user_cutoffs.get(entry.user_id, cutoff))
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """Удалить истекшие записи и перечитать действующие; транзакцию фиксирует планировщик"""
+        now = datetime.now(timezone.utc)
+        await db.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+        result = await db.execute(select(RevokedToken))
+        fresh = RevocationList()
+        for entry in result.scalars().all():
+            fresh.apply(entry)
+        self.jtis, self.user_cutoffs, self.refreshed_at = fresh.jtis, fresh.user_cutoffs, now
+
+    async def revoke_token(self, db: AsyncSession, jti: str, user_id: int, expires_at: datetime) -> RevokedToken:
+        """
+        Отозвать один токен до его истечения. Коммит — за вызывающим, после
+        него запись передается в apply: откаченный отзыв не должен действовать.
+        """
+        entry = RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at)
+        db.add(entry)
+        return entry
+
+    async def revoke_user(self, db: AsyncSession, user_id: int, lifetime: timedelta) -> RevokedToken:
+        """
+        Отозвать все выпущенные до этого момента токены пользователя.
+        lifetime — максимальный срок жизни токена: после него запись не нужна.
+        Как и в revoke_token, после коммита запись передается в apply.
+        """
+        now = datetime.now(timezone.utc)
+        entry = RevokedToken(user_id=user_id, revoked_before=now, expires_at=now + lifetime)
+        db.add(entry)
+        return entry
+
+def _timestamp(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+revocation_list = RevocationList()
+
+async def refresh_revocations(db: AsyncSession) -> None:
+    await revocation_list.refresh(db)
@@ -1,20 +1,28 @@
-from datetime import timedelta
-from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timedelta
+from typing import Annotated, AsyncIterator, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from database import get_db
+from database import get_db, async_session
 from models import User
-from .schemas import UserCreate, User as UserSchema, Token
+from pagination import Page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from .schemas import UserCreate, UserAdminUpdate, UserAdminView, User as UserSchema, Token, RefreshRequest
 from .security import (
     verify_password,
     get_password_hash,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    Principal,
+    user_claims,
     get_current_active_user,
+    get_current_active_principal,
+    get_admin_user,
 )
+from .revocation import revocation_list
+from .sessions import start_session, rotate_session, revoke_session, revoke_user_sessions
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -36,7 +44,7 @@ async def register(
         )
     
     # Создаем нового пользователя
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     user = User(
         email=user_data.email,
         username=user_data.username,
@@ -59,21 +67,57 @@ async def login(
     user = result.scalar_one_or_none()
     
     # Проверяем существование пользователя и правильность пароля
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await verify_password(form_data.password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Хеш со старыми параметрами заменяем, пока известен открытый пароль
+    if new_hash:
+        user.hashed_password = new_hash
+    # Сессия позволяет дальше обновлять токен без пароля
+    refresh_token = start_session(db, user.id)
+    await db.commit()
+    
     # Создаем токен доступа
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username},
+        data=user_claims(user),
         expires_delta=access_token_expires
     )
     
-    return Token(access_token=access_token, token_type="bearer")
+    return Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token)
+
+@router.post("/refresh", response_model=Token)
+async def refresh(
+    refresh_data: RefreshRequest,
+    db: AsyncSession = Depends(get_db)
+) -> Token:
+    """
+    Обменять refresh-токен на новую пару токенов без проверки пароля.
+    Каждый refresh-токен действует один раз.
+    """
+    rotated = await rotate_session(db, refresh_data.refresh_token)
+    # Фиксируем и ротацию, и отзыв семейства при повторном использовании
+    await db.commit()
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user, refresh_token = rotated
+    
+    access_token = create_access_token(
+        data=user_claims(user),
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token)
 
 @router.get("/me", response_model=UserSchema)
 async def read_users_me(
@@ -89,11 +133,97 @@ async def verify_token(
     """Проверка валидности токена"""
     return {"valid": True, "user": current_user}
 
-@router.get("/users", response_model=List[UserSchema])
+# Строк на одну выборку из серверного курсора при выгрузке
+EXPORT_BATCH_SIZE = 1000
+
+@router.get("/users", response_model=Page[UserAdminView])
 async def get_users(
+    is_active: Optional[bool] = None,
+    is_admin: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    format: Literal["json", "ndjson"] = "json",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
-) -> List[User]:
-    """Получить список всех пользователей (только для админов)"""
-    stmt = select(User)
-    result = await db.execute(stmt)
-    return result.scalars().all() 
\ No newline at end of file
+    _: Principal = Depends(get_admin_user)
+):
+    """
+    Список пользователей по возрастанию id (только для админов).
+    format=ndjson выгружает всех подходящих пользователей построчно
+    через серверный курсор, не держа выборку в памяти; limit не применяется.
+    """
+    stmt = select(User).order_by(User.id)
+    if is_active is not None:
+        stmt = stmt.where(User.is_active == is_active)
+    if is_admin is not None:
+        stmt = stmt.where(User.is_admin == is_admin)
+    if created_from is not None:
+        stmt = stmt.where(User.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(User.created_at < created_to)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        stmt = stmt.where(User.id > last_id)
+    
+    if format == "ndjson":
+        return StreamingResponse(_export_users(stmt), media_type="application/x-ndjson")
+    
+    result = await db.execute(stmt.limit(limit + 1))
+    users = result.scalars().all()
+    
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1].id)
+    
+    return Page[UserAdminView](
+        items=[UserAdminView.model_validate(user) for user in users],
+        next_cursor=next_cursor
+    )
+
+async def _export_users(stmt) -> AsyncIterator[str]:
+    # Своя сессия: сессия зависимости закрывается до начала потоковой отдачи
+    async with async_session() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for users in result.scalars().partitions():
+            yield "".join(UserAdminView.model_validate(user).model_dump_json() + "\n" for user in users)
+
+@router.patch("/users/{user_id}", response_model=UserSchema)
+async def update_user_status(
+    user_id: int,
+    user_data: UserAdminUpdate,
+    db: AsyncSession = Depends(get_db),
+    _: Principal = Depends(get_admin_user)
+) -> User:
+    """Заблокировать/разблокировать пользователя или изменить его права (только для админов)"""
+    user = await db.get(User, user_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    for key, value in user_data.model_dump(exclude_unset=True).items():
+        setattr(user, key, value)
+    # Роль и активность зашиты в токены — отзываем все выпущенные,
+    # пользователь получит новые утверждения при следующем входе
+    revocation = await revocation_list.revoke_user(db, user.id, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    if user_data.is_active is False:
+        await revoke_user_sessions(db, user.id)
+    await db.commit()
+    revocation_list.apply(revocation)
+    return user
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    current_user: Annotated[Principal, Depends(get_current_active_principal)],
+    refresh_data: Optional[RefreshRequest] = None,
+    db: AsyncSession = Depends(get_db)
+) -> None:
+    """Отозвать текущий токен доступа и, если передан refresh-токен, его сессию"""
+    revocation = await revocation_list.revoke_token(db, current_user.jti, current_user.id, current_user.expires_at)
+    if refresh_data is not None:
+        await revoke_session(db, refresh_data.refresh_token, current_user.id)
+    await db.commit()
+    revocation_list.apply(revocation)
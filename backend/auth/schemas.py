@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel, EmailStr
 
 class UserBase(BaseModel):
@@ -14,13 +15,25 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: str | None = None
 
+class UserAdminUpdate(BaseModel):
+    is_active: bool | None = None
+    is_admin: bool | None = None
+
 class User(UserBase):
     id: int
     is_admin: bool
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class UserAdminView(User):
+    is_active: bool
+    created_at: datetime | None = None
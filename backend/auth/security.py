@@ -1,7 +1,9 @@
-from datetime import datetime, timedelta
-from typing import Optional
+import math
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -10,20 +12,30 @@ from sqlalchemy import select
 from database import get_db
 from models import User
 from .schemas import TokenData
+from .hashing import verify_password, get_password_hash  # noqa: F401
+from .revocation import revocation_list
 
 # Настройки JWT
 SECRET_KEY = "your-secret-key"  # В продакшене использовать безопасный ключ
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+@dataclass(frozen=True)
+class Principal:
+    """Пользователь по утверждениям токена — без обращения к базе"""
+    id: int
+    username: str
+    is_admin: bool
+    is_active: bool
+    jti: str
+    issued_at: datetime
+    expires_at: datetime
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+def user_claims(user: User) -> dict:
+    """Утверждения токена доступа о пользователе"""
+    return {"sub": user.username, "uid": user.id, "adm": user.is_admin, "act": user.is_active}
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -31,14 +43,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # iat с миллисекундами (NumericDate допускает дробь): отсечка отзыва по
+    # пользователю не задевает токены, выпущенные в ту же секунду после нее
+    issued_at = math.floor(datetime.now(timezone.utc).timestamp() * 1000) / 1000
+    to_encode.update({"exp": expire, "iat": issued_at, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
-) -> User:
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme)
+) -> Principal:
+    """
+    Проверить подпись, срок и отзыв токена без запросов к базе. Роль и
+    активность берутся из токена: при их изменении токены пользователя отзываются.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,15 +65,59 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        user_id: int = payload.get("uid")
+        jti: str = payload.get("jti")
+        issued_at = payload.get("iat")
+        # Токены без этих утверждений выпущены до их введения — нужен повторный вход
+        if username is None or user_id is None or jti is None or issued_at is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    stmt = select(User).where(User.username == username)
+
+    if revocation_list.is_revoked(jti, user_id, issued_at):
+        raise credentials_exception
+    return Principal(
+        id=user_id,
+        username=username,
+        is_admin=bool(payload.get("adm")),
+        is_active=bool(payload.get("act")),
+        jti=jti,
+        issued_at=datetime.fromtimestamp(issued_at, timezone.utc),
+        expires_at=datetime.fromtimestamp(payload["exp"], timezone.utc),
+    )
+
+async def get_current_active_principal(
+    principal: Principal = Depends(get_current_principal)
+) -> Principal:
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+async def get_admin_user(
+    current_user: Annotated[Principal, Depends(get_current_active_principal)]
+) -> Principal:
+    """Администратор по утверждениям токена — общая зависимость админских маршрутов"""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return current_user
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Строка пользователя из базы — для обработчиков, которым мало утверждений токена"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    stmt = select(User).where(User.username == principal.username)
     result = await db.execute(stmt)
     user = result.scalar_one_or_none()
-    
+
     if user is None:
         raise credentials_exception
     return user
@@ -65,4 +127,4 @@ async def get_current_active_user(
 ) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user 
\ No newline at end of file
+    return current_user
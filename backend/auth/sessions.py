@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import select, update, delete, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import User, UserSession
+
+logger = logging.getLogger(__name__)
+
+# Срок жизни refresh-токена; каждая ротация продлевает сессию
+REFRESH_TOKEN_EXPIRE_DAYS = 30
+# Повтор обмененного токена в течение этого окна считается гонкой клиента
+# (две вкладки обновили токен одновременно), а не утечкой
+REUSE_GRACE_SECONDS = 10
+# Как часто удаляются истекшие сессии (в секундах)
+SESSION_PURGE_INTERVAL = 3600
+
+def hash_refresh_token(refresh_token: str) -> str:
+    """Токен случайный и длинный, поэтому достаточно sha256 без соли и bcrypt"""
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+def start_session(db: AsyncSession, user_id: int, family_id: Optional[str] = None) -> str:
+    """Добавить сессию в текущую транзакцию и вернуть открытый refresh-токен"""
+    refresh_token = secrets.token_urlsafe(32)
+    db.add(UserSession(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4().hex,
+        token_hash=hash_refresh_token(refresh_token),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    return refresh_token
+
+async def rotate_session(db: AsyncSession, refresh_token: str) -> Optional[Tuple[Row, str]]:
+    """
+    Обменять refresh-токен на новый одним UPDATE ... RETURNING по уникальному
+    индексу token_hash. Возвращает поля пользователя для утверждений токена
+    (id, username, is_admin, is_active) и новый refresh-токен;
+    None — если токен недействителен.
+    Повторное предъявление обмененного токена отзывает все семейство сессий.
+    Коммит — за вызывающим, в том числе когда возвращается None.
+    """
+    now = datetime.now(timezone.utc)
+    token_hash = hash_refresh_token(refresh_token)
+    stmt = (
+        update(UserSession)
+        .where(
+            UserSession.token_hash == token_hash,
+            UserSession.rotated_at.is_(None),
+            UserSession.revoked_at.is_(None),
+            UserSession.expires_at > now,
+            User.id == UserSession.user_id
+        )
+        .values(rotated_at=now)
+        .returning(UserSession.family_id, User.id, User.username, User.is_admin, User.is_active)
+        .execution_options(synchronize_session=False)
+    )
+    row = (await db.execute(stmt)).first()
+    if row is not None:
+        return row, start_session(db, row.id, row.family_id)
+
+    stmt = select(UserSession.family_id, UserSession.user_id, UserSession.rotated_at).where(
+        UserSession.token_hash == token_hash,
+        UserSession.rotated_at.is_not(None)
+    )
+    reused = (await db.execute(stmt)).first()
+    if reused is not None and reused.rotated_at < now - timedelta(seconds=REUSE_GRACE_SECONDS):
+        logger.warning("Refresh token reuse for user %s, revoking session family", reused.user_id)
+        await revoke_session_family(db, reused.family_id)
+    return None
+
+async def revoke_session_family(db: AsyncSession, family_id: str) -> None:
+    await db.execute(
+        update(UserSession)
+        .where(UserSession.family_id == family_id, UserSession.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+
+async def revoke_session(db: AsyncSession, refresh_token: str, user_id: int) -> None:
+    """Завершить сессию, к которой относится refresh-токен пользователя"""
+    stmt = select(UserSession.family_id).where(
+        UserSession.token_hash == hash_refresh_token(refresh_token),
+        UserSession.user_id == user_id
+    )
+    family_id = (await db.execute(stmt)).scalar_one_or_none()
+    if family_id is not None:
+        await revoke_session_family(db, family_id)
+
+async def revoke_user_sessions(db: AsyncSession, user_id: int) -> None:
+    await db.execute(
+        update(UserSession)
+        .where(UserSession.user_id == user_id, UserSession.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+
+async def purge_expired_sessions(db: AsyncSession) -> None:
+    """Периодическая очистка; транзакцию фиксирует планировщик"""
+    await db.execute(delete(UserSession).where(UserSession.expires_at < datetime.now(timezone.utc)))
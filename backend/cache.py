@@ -0,0 +1,60 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Все кэши процесса по имени — для статистики попаданий
+caches: Dict[str, "TTLCache"] = {}
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    In-process кэш с ограничением по времени жизни (TTL) и размеру (вытеснение LRU).
+    Каждый процесс держит свою копию, поэтому TTL задает максимальную
+    устаревшость данных между процессами; внутри процесса записи
+    сбрасываются явной инвалидацией.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        caches[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or entry[0] <= time.monotonic():
+            if entry is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
@@ -5,8 +5,8 @@ from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
 from database import get_db
-from models import CartItem, Product, User
-from auth.security import get_current_active_user
+from models import CartItem, Product
+from auth.security import Principal, get_current_active_principal
 from .schemas import CartItemCreate, CartItemUpdate, CartItem as CartItemSchema
 
 router = APIRouter(prefix="/cart", tags=["cart"])
@@ -14,7 +14,7 @@ router = APIRouter(prefix="/cart", tags=["cart"])
 @router.get("/", response_model=List[CartItemSchema])
 async def get_cart_items(
     db: AsyncSession = Depends(get_db),
-    current_user: Annotated[User, Depends(get_current_active_user)] = None
+    current_user: Annotated[Principal, Depends(get_current_active_principal)] = None
 ) -> List[CartItem]:
     """Получить содержимое корзины пользователя"""
     stmt = select(CartItem).where(CartItem.user_id == current_user.id).options(selectinload(CartItem.product))
@@ -25,7 +25,7 @@ async def get_cart_items(
 async def add_to_cart(
     cart_item_data: CartItemCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: Annotated[User, Depends(get_current_active_user)] = None
+    current_user: Annotated[Principal, Depends(get_current_active_principal)] = None
 ) -> CartItem:
     """Добавить товар в корзину"""
     # Проверяем существование продукта
@@ -80,7 +80,7 @@ async def update_cart_item(
     cart_item_id: int,
     cart_item_data: CartItemUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: Annotated[User, Depends(get_current_active_user)] = None
+    current_user: Annotated[Principal, Depends(get_current_active_principal)] = None
 ) -> CartItem:
     """Обновить количество товара в корзине"""
     stmt = select(CartItem).where(
@@ -118,7 +118,7 @@ async def update_cart_item(
 async def remove_from_cart(
     cart_item_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: Annotated[User, Depends(get_current_active_user)] = None
+    current_user: Annotated[Principal, Depends(get_current_active_principal)] = None
 ) -> None:
     """Удалить товар из корзины"""
     stmt = select(CartItem).where(
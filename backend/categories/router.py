@@ -1,26 +1,16 @@
-from typing import List, Annotated
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, update, delete
 from sqlalchemy.exc import IntegrityError
 
-from database import get_db
-from models import Category, User
-from auth.security import get_current_active_user
+from database import get_db, get_read_db
+from models import Category
+from auth.security import Principal, get_admin_user
 from .schemas import CategoryCreate, CategoryUpdate, Category as CategorySchema
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
-async def get_admin_user(
-    current_user: Annotated[User, Depends(get_current_active_user)]
-) -> User:
-    if not current_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    return current_user
-
 # --- Вспомогательные функции для nested sets ---
 
 async def insert_category_nested(db, name, description, parent_id=None):
@@ -66,7 +56,7 @@ async def delete_category_nested(db, category: Category):
 
 @router.get("/", response_model=List[CategorySchema])
 async def get_categories(
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> List[Category]:
     """Получить дерево категорий (отсортировано по lft)"""
     stmt = select(Category).order_by(Category.lft)
@@ -76,7 +66,7 @@ async def get_categories(
 @router.get("/{category_id}", response_model=CategorySchema)
 async def get_category(
     category_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Category:
     """Получить категорию по ID"""
     stmt = select(Category).where(Category.id == category_id)
@@ -94,7 +84,7 @@ async def get_category(
 async def create_category(
     category_data: CategoryCreate,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: Principal = Depends(get_admin_user)
 ) -> Category:
     """Создать новую категорию (nested sets)"""
     # Проверяем уникальность имени
@@ -117,7 +107,7 @@ async def update_category(
     category_id: int,
     category_data: CategoryUpdate,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: Principal = Depends(get_admin_user)
 ) -> Category:
     """Обновить категорию (имя, описание, parent_id)"""
     stmt = select(Category).where(Category.id == category_id)
@@ -145,7 +135,7 @@ async def update_category(
 async def delete_category(
     category_id: int,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: Principal = Depends(get_admin_user)
 ) -> None:
     """Удалить категорию и все подкатегории (nested sets)"""
     stmt = select(Category).where(Category.id == category_id)
@@ -1,13 +1,155 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import logging
+import time
+from typing import Optional
+
+from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = "postgresql+asyncpg://admin:admin123@db:5432/computer_store"
+from settings import database_settings
+from monitoring.metrics import TimedAsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = database_settings.url
+# Cookie с unix-временем, до которого чтения пользователя идут на основную базу
+READ_PRIMARY_COOKIE = "read_primary_until"
+# Как часто проверяется отставание реплики (в секундах)
+REPLICA_CHECK_INTERVAL = 2
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+def _create_engine(url: str, name: str) -> AsyncEngine:
+    return create_async_engine(
+        # Кэш подготовленных запросов есть и у диалекта SQLAlchemy, и у asyncpg —
+        # оба получают одно значение
+        make_url(url).update_query_dict(
+            {"prepared_statement_cache_size": str(database_settings.statement_cache_size)}
+        ),
+        echo=database_settings.echo,
+        poolclass=TimedAsyncAdaptedQueuePool,
+        # Имя пула — метка engine в метриках; сохраняется при пересоздании пула
+        pool_logging_name=name,
+        pool_size=database_settings.pool_size,
+        max_overflow=database_settings.max_overflow,
+        pool_timeout=database_settings.pool_timeout,
+        pool_recycle=database_settings.pool_recycle,
+        pool_pre_ping=database_settings.pool_pre_ping,
+        connect_args={"statement_cache_size": database_settings.statement_cache_size},
+    )
+
+engine = _create_engine(DATABASE_URL, "primary")
 async_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+replica_engine: Optional[AsyncEngine] = None
+replica_session: Optional[sessionmaker] = None
+if database_settings.replica_url:
+    replica_engine = _create_engine(database_settings.replica_url, "replica")
+    replica_session = sessionmaker(
+        replica_engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+class ReplicaState:
+    """Последняя измеренная задержка реплики; до первого замера реплика не используется"""
+    lag: Optional[float] = None
+
+    @property
+    def usable(self) -> bool:
+        return self.lag is not None and self.lag <= database_settings.replica_max_lag
+
+replica_state = ReplicaState()
+
 async def get_db() -> AsyncSession:
     async with async_session() as session:
-        yield session 
\ No newline at end of file
+        yield session
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """
+    Сессия для обработчиков, которые только читают. Идет на реплику, если она
+    настроена и не отстает, а пользователь недавно ничего не записывал
+    (иначе он мог бы не увидеть собственных изменений).
+    """
+    factory = async_session
+    if replica_session is not None and replica_state.usable and not _reads_own_writes(request):
+        factory = replica_session
+    async with factory() as session:
+        yield session
+
+def _reads_own_writes(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+async def check_replica_lag(_: AsyncSession) -> None:
+    """
+    Замерить отставание реплики (периодическая задача). Реплика, применившая
+    весь полученный WAL, считается догнавшей, даже если на основной базе
+    давно не было записей, — но только пока WAL-приемник в статусе streaming:
+    без него позиция приема замирает и равенство ничего не говорит.
+    Статус в pg_stat_wal_receiver виден ролям с pg_read_all_stats (pg_monitor);
+    без этих прав реплика считается не получающей WAL и не используется.
+    """
+    if replica_session is None:
+        return
+    try:
+        async with replica_session() as session:
+            lag = (await session.execute(text(
+                "SELECT CASE "
+                "WHEN NOT pg_is_in_recovery() THEN 0 "
+                "WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL "
+                "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            ))).scalar()
+        if lag is None:
+            if replica_state.lag is not None:
+                logger.warning("Replica WAL receiver is not streaming, reading from primary")
+            replica_state.lag = None
+            return
+        replica_state.lag = float(lag)
+    except Exception:
+        logger.exception("Replica lag check failed, reading from primary")
+        replica_state.lag = None
+
+class ReadYourWritesMiddleware:
+    """
+    После успешного изменяющего запроса ставит cookie, по которой get_read_db
+    следующие database_settings.read_your_writes секунд читает с основной базы.
+    """
+
+    SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in self.SAFE_METHODS or replica_session is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                ttl = database_settings.read_your_writes
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}={time.time() + ttl:.0f}; "
+                    f"Max-Age={ttl}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+def pool_stats(target: Optional[AsyncEngine] = None) -> dict:
+    """Состояние пула соединений этого процесса (по умолчанию — основной базы)"""
+    pool = (target or engine).sync_engine.pool
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": database_settings.max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # QueuePool считает overflow от -pool_size, пока пул не заполнен
+        "overflow": max(pool.overflow(), 0),
+    }
@@ -0,0 +1,160 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, column, delete, func, insert, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Product, StockReservation
+
+# Сколько резерв держит товар за корзиной, прежде чем вернуть его на склад
+RESERVATION_TTL = timedelta(minutes=15)
+
+@dataclass
+class StockShortage:
+    product_id: int
+    requested: int
+    available: Optional[int]  # None — товар не найден
+
+def _lines_values(lines: Dict[int, int]):
+    """VALUES (product_id, quantity), ... для set-based обновления остатков"""
+    return values(
+        column("product_id", Integer),
+        column("quantity", Integer),
+        name="lines",
+    ).data(list(lines.items()))
+
+async def decrement_stock(db: AsyncSession, lines: Dict[int, int]) -> List[StockShortage]:
+    """
+    Условно списать остатки одним запросом:
+    UPDATE products SET stock = stock - q WHERE id = :id AND stock >= q RETURNING id.
+    Строки, которые не удалось списать, возвращаются как нехватка; успешные списания
+    остаются в транзакции — вызывающий решает, откатывать ли их.
+    """
+    lines = {product_id: quantity for product_id, quantity in lines.items() if quantity > 0}
+    if not lines:
+        return []
+
+    v = _lines_values(lines)
+    stmt = (
+        update(Product)
+        .where(Product.id == v.c.product_id, Product.stock >= v.c.quantity)
+        .values(stock=Product.stock - v.c.quantity)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    decremented = set(result.scalars().all())
+
+    missing = [product_id for product_id in lines if product_id not in decremented]
+    if not missing:
+        return []
+
+    # Медленный путь: узнаем фактические остатки только для проблемных строк
+    stmt = select(Product.id, Product.stock).where(Product.id.in_(missing))
+    available = dict((await db.execute(stmt)).all())
+    return [
+        StockShortage(product_id=product_id, requested=lines[product_id], available=available.get(product_id))
+        for product_id in missing
+    ]
+
+async def restock(db: AsyncSession, lines: Dict[int, int]) -> None:
+    """Вернуть товары на склад одним запросом"""
+    lines = {product_id: quantity for product_id, quantity in lines.items() if quantity > 0}
+    if not lines:
+        return
+
+    v = _lines_values(lines)
+    stmt = (
+        update(Product)
+        .where(Product.id == v.c.product_id)
+        .values(stock=Product.stock + v.c.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(stmt)
+
+async def take_user_reservations(db: AsyncSession, user_id: int) -> Dict[int, int]:
+    """
+    Забрать все резервы пользователя (включая просроченные, но еще не возвращенные).
+    DELETE ... RETURNING гарантирует, что одну и ту же строку не заберут
+    одновременно checkout и очистка просроченных резервов.
+    """
+    stmt = (
+        delete(StockReservation)
+        .where(StockReservation.user_id == user_id)
+        .returning(StockReservation.product_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    return dict(result.all())
+
+async def release_user_reservations(db: AsyncSession, user_id: int) -> None:
+    """Снять резервы пользователя и вернуть товары на склад"""
+    await restock(db, await take_user_reservations(db, user_id))
+
+async def release_expired_reservations(db: AsyncSession, now: Optional[datetime] = None) -> int:
+    """
+    Вернуть на склад все просроченные резервы одним запросом:
+    WITH expired AS (DELETE ... RETURNING) UPDATE products ... FROM expired.
+    Возвращает количество товаров, остатки которых были восстановлены.
+    """
+    now = now or datetime.utcnow()
+    expired = (
+        delete(StockReservation)
+        .where(StockReservation.expires_at <= now)
+        .returning(StockReservation.product_id, StockReservation.quantity)
+        .cte("expired")
+    )
+    totals = (
+        select(expired.c.product_id, func.sum(expired.c.quantity).label("quantity"))
+        .group_by(expired.c.product_id)
+        .subquery()
+    )
+    stmt = (
+        update(Product)
+        .where(Product.id == totals.c.product_id)
+        .values(stock=Product.stock + totals.c.quantity)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    return len(result.all())
+
+async def reserve_lines(
+    db: AsyncSession,
+    user_id: int,
+    lines: Dict[int, int],
+    ttl: timedelta = RESERVATION_TTL,
+) -> Tuple[Dict[int, int], List[StockShortage], datetime]:
+    """
+    Зарезервировать товары за пользователем. Старые резервы пользователя
+    сначала возвращаются на склад, затем строки списываются условным UPDATE.
+    Резерв частичный: успешно списанные строки сохраняются, остальные
+    возвращаются как нехватка. Транзакцию фиксирует вызывающий.
+    """
+    await release_user_reservations(db, user_id)
+
+    shortages = await decrement_stock(db, lines)
+    failed = {shortage.product_id for shortage in shortages}
+    reserved = {
+        product_id: quantity
+        for product_id, quantity in lines.items()
+        if product_id not in failed and quantity > 0
+    }
+
+    expires_at = datetime.utcnow() + ttl
+    if reserved:
+        await db.execute(
+            insert(StockReservation),
+            [
+                {
+                    "user_id": user_id,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "expires_at": expires_at,
+                    "created_at": datetime.utcnow(),
+                }
+                for product_id, quantity in reserved.items()
+            ],
+        )
+    return reserved, shortages, expires_at
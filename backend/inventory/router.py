@@ -0,0 +1,62 @@
+from typing import List, Annotated
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from database import get_db
+from models import CartItem, StockReservation
+from auth.security import Principal, get_current_active_principal
+from .reservations import reserve_lines, release_user_reservations, release_expired_reservations
+from .schemas import (
+    ReservationResult,
+    ReservedLine,
+    FailedLine,
+    Reservation as ReservationSchema
+)
+
+router = APIRouter(prefix="/inventory", tags=["inventory"])
+
+@router.get("/reservations", response_model=List[ReservationSchema])
+async def get_reservations(
+    db: AsyncSession = Depends(get_db),
+    current_user: Annotated[Principal, Depends(get_current_active_principal)] = None
+) -> List[StockReservation]:
+    """Получить активные резервы пользователя"""
+    stmt = select(StockReservation).where(StockReservation.user_id == current_user.id)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+@router.post("/reservations", response_model=ReservationResult)
+async def reserve_cart(
+    db: AsyncSession = Depends(get_db),
+    current_user: Annotated[Principal, Depends(get_current_active_principal)] = None
+) -> ReservationResult:
+    """Зарезервировать товары из корзины на короткое время (частичный резерв)"""
+    # Заодно возвращаем на склад чужие просроченные резервы
+    await release_expired_reservations(db)
+
+    stmt = select(CartItem.product_id, CartItem.quantity).where(CartItem.user_id == current_user.id)
+    lines = {}
+    for product_id, quantity in (await db.execute(stmt)).all():
+        lines[product_id] = lines.get(product_id, 0) + quantity
+
+    reserved, shortages, expires_at = await reserve_lines(db, current_user.id, lines)
+    await db.commit()
+
+    return ReservationResult(
+        reserved=[ReservedLine(product_id=product_id, quantity=quantity) for product_id, quantity in reserved.items()],
+        failed=[
+            FailedLine(product_id=s.product_id, requested=s.requested, available=s.available)
+            for s in shortages
+        ],
+        expires_at=expires_at if reserved else None
+    )
+
+@router.delete("/reservations", status_code=status.HTTP_204_NO_CONTENT)
+async def release_reservations(
+    db: AsyncSession = Depends(get_db),
+    current_user: Annotated[Principal, Depends(get_current_active_principal)] = None
+) -> None:
+    """Снять резервы пользователя и вернуть товары на склад"""
+    await release_user_reservations(db, current_user.id)
+    await db.commit()
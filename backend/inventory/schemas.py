@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+class ReservedLine(BaseModel):
+    product_id: int
+    quantity: int
+
+class FailedLine(BaseModel):
+    product_id: int
+    requested: int
+    available: Optional[int] = None  # None — товар не найден
+
+class ReservationResult(BaseModel):
+    reserved: List[ReservedLine]
+    failed: List[FailedLine]
+    expires_at: Optional[datetime] = None
+
+class Reservation(BaseModel):
+    id: int
+    product_id: int
+    quantity: int
+    expires_at: datetime
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update, and_, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Job
+
+# Обработчик получает сессию (коммитит воркер) и payload задачи
+JobHandler = Callable[[AsyncSession, dict], Awaitable[None]]
+
+# Через сколько задача в статусе running считается брошенной (воркер упал)
+VISIBILITY_TIMEOUT = timedelta(minutes=5)
+
+@dataclass
+class JobType:
+    name: str
+    handler: JobHandler
+    concurrency: int
+    max_attempts: int
+
+registry: Dict[str, JobType] = {}
+
+# Как часто замерять глубину очереди для /metrics, секунд
+QUEUE_DEPTH_REFRESH_INTERVAL = 15
+# Последний замер глубины очереди по типам: /metrics отдает его без запроса к базе
+pending_jobs: Dict[str, int] = {}
+
+def job_handler(name: str, concurrency: int = 1, max_attempts: int = 5):
+    """Зарегистрировать обработчик задач типа name с лимитом параллельности"""
+    def decorator(handler: JobHandler) -> JobHandler:
+        registry[name] = JobType(
+            name=name,
+            handler=handler,
+            concurrency=concurrency,
+            max_attempts=max_attempts
+        )
+        return handler
+    return decorator
+
+async def enqueue(
+    db: AsyncSession,
+    job_type: str,
+    payload: dict,
+    run_at: Optional[datetime] = None
+) -> None:
+    """
+    Поставить задачу в очередь в текущей транзакции: задача появится
+    только вместе с данными, которые ее породили.
+    """
+    job_spec = registry.get(job_type)
+    db.add(Job(
+        type=job_type,
+        payload=payload,
+        status="pending",
+        attempts=0,
+        max_attempts=job_spec.max_attempts if job_spec else 5,
+        run_at=run_at or datetime.utcnow(),
+        created_at=datetime.utcnow()
+    ))
+
+async def claim_job(db: AsyncSession, job_types: List[str]) -> Optional[Job]:
+    """
+    Забрать одну готовую задачу из указанных типов одним запросом:
+    UPDATE jobs ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED) RETURNING.
+    Брошенные running-задачи забираются повторно после VISIBILITY_TIMEOUT.
+    """
+    now = datetime.utcnow()
+    candidate = (
+        select(Job.id)
+        .where(
+            Job.type.in_(job_types),
+            or_(
+                and_(Job.status == "pending", Job.run_at <= now),
+                and_(Job.status == "running", Job.locked_at <= now - VISIBILITY_TIMEOUT)
+            )
+        )
+        .order_by(Job.run_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(Job)
+        .where(Job.id == candidate)
+        .values(status="running", locked_at=now, attempts=Job.attempts + 1)
+        .returning(Job)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    job = result.scalar_one_or_none()
+    await db.commit()
+    return job
+
+async def queue_depth(db: AsyncSession) -> Dict[str, int]:
+    """Количество ожидающих задач по типам"""
+    stmt = (
+        select(Job.type, func.count())
+        .where(Job.status == "pending")
+        .group_by(Job.type)
+    )
+    result = await db.execute(stmt)
+    return dict(result.all())
+
+async def refresh_queue_depth(db: AsyncSession) -> None:
+    """
+    Замерить глубину очереди (периодическая задача). Нули для всех
+    зарегистрированных типов: опустевшая очередь не должна оставлять
+    в Prometheus последнее ненулевое значение.
+    """
+    depth = dict.fromkeys(registry, 0)
+    depth.update(await queue_depth(db))
+    pending_jobs.clear()
+    pending_jobs.update(depth)
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session
+from models import Job
+from .queue import registry, claim_job
+
+logger = logging.getLogger(__name__)
+
+# Периодическая задача получает сессию; коммит выполняет планировщик
+PeriodicTask = Callable[[AsyncSession], Awaitable[object]]
+
+JOB_WORKERS = 4
+POLL_INTERVAL = 1.0
+BACKOFF_BASE = 5.0     # секунды до первого повтора
+BACKOFF_MAX = 3600.0   # потолок задержки между повторами
+
+def backoff_delay(attempts: int) -> float:
+    """Экспоненциальная задержка с джиттером: 5с, 10с, 20с, ... но не больше часа"""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+class JobWorkerPool:
+    """
+    Пул asyncio-воркеров поверх таблицы jobs. Работает внутри процесса
+    приложения, без внешнего брокера; несколько процессов безопасно делят
+    одну очередь благодаря SKIP LOCKED.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, poll_interval: float = POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.running: Dict[str, int] = {}
+        # Свободные слоты по типам (concurrency минус выполняемые и зарезервированные)
+        self._free: Dict[str, int] = {}
+        self._periodic: List[tuple] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add_periodic(self, task: PeriodicTask, interval: float) -> None:
+        """Запускать task каждые interval секунд, пока работает пул"""
+        self._periodic.append((task, interval))
+
+    async def start(self) -> None:
+        self._free = {name: spec.concurrency for name, spec in registry.items()}
+        self.running = {name: 0 for name in registry}
+        self._tasks = [asyncio.create_task(self._worker_loop()) for _ in range(self.workers)]
+        self._tasks += [
+            asyncio.create_task(self._periodic_loop(task, interval))
+            for task, interval in self._periodic
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker_loop(self) -> None:
+        while True:
+            # Слот резервируется до захвата задачи (между проверкой и резервом нет
+            # await), иначе захваченная задача ждала бы слота, пока идет ее
+            # VISIBILITY_TIMEOUT, а другие воркеры не могли бы ее взять
+            reserved = [name for name, free in self._free.items() if free > 0]
+            for name in reserved:
+                self._free[name] -= 1
+            job = None
+            try:
+                if reserved:
+                    async with async_session() as db:
+                        job = await claim_job(db, reserved)
+            except Exception:
+                logger.exception("Failed to claim a job")
+            finally:
+                # Резервы остальных типов возвращаются сразу
+                for name in reserved:
+                    if job is None or name != job.type:
+                        self._free[name] += 1
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            try:
+                await self._run(job)
+            finally:
+                self._free[job.type] += 1
+
+    async def _run(self, job: Job) -> None:
+        spec = registry[job.type]
+        self.running[job.type] += 1
+        try:
+            # Результат обработчика и удаление задачи фиксируются одной транзакцией
+            async with async_session() as db:
+                await spec.handler(db, job.payload)
+                await db.execute(delete(Job).where(Job.id == job.id))
+                await db.commit()
+        except Exception as e:
+            logger.exception("Job %s (%s) failed on attempt %d", job.id, job.type, job.attempts)
+            await self._fail(job, e)
+        finally:
+            self.running[job.type] -= 1
+
+    async def _fail(self, job: Job, error: Exception) -> None:
+        values = {"locked_at": None, "last_error": repr(error)}
+        if job.attempts >= job.max_attempts:
+            values["status"] = "failed"
+        else:
+            values["status"] = "pending"
+            values["run_at"] = datetime.utcnow() + timedelta(seconds=backoff_delay(job.attempts))
+        try:
+            async with async_session() as db:
+                await db.execute(update(Job).where(Job.id == job.id).values(**values))
+                await db.commit()
+        except Exception:
+            # Задача останется running и будет подобрана снова после VISIBILITY_TIMEOUT
+            logger.exception("Failed to record failure of job %s", job.id)
+
+    async def _periodic_loop(self, task: PeriodicTask, interval: float) -> None:
+        while True:
+            try:
+                async with async_session() as db:
+                    await task(db)
+                    await db.commit()
+            except Exception:
+                logger.exception("Periodic task %s failed", task.__name__)
+            await asyncio.sleep(interval)
+
+job_pool = JobWorkerPool()
@@ -1,18 +1,65 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from auth.router import router as auth_router
 from categories.router import router as categories_router
 from products.router import router as products_router
-from orders.router import router as orders_router
+from orders.router import router as orders_router, admin_router as admin_orders_router
 from reviews.router import router as reviews_router
 from cart.router import router as cart_router
 from suppliers.router import router as suppliers_router
+from inventory.router import router as inventory_router
+from analytics.router import router as analytics_router
+from orders.idempotency import purge_expired_keys, IDEMPOTENCY_PURGE_INTERVAL
+from inventory.reservations import release_expired_reservations
+from orders.partitions import maintain_order_partitions, PARTITION_MAINTENANCE_INTERVAL
+from suppliers.reorder import compute_reorder_suggestions, REORDER_INTERVAL
+from jobs.worker import job_pool
+from jobs.queue import refresh_queue_depth, QUEUE_DEPTH_REFRESH_INTERVAL
+from auth.hashing import hashing_pool
+from auth.revocation import refresh_revocations, REVOCATION_REFRESH_INTERVAL
+from auth.sessions import purge_expired_sessions, SESSION_PURGE_INTERVAL
+from ratelimit.middleware import RateLimitMiddleware
+from database import engine, replica_engine, ReadYourWritesMiddleware, check_replica_lag, REPLICA_CHECK_INTERVAL
+from monitoring.router import router as monitoring_router, metrics_router
+from monitoring.metrics import MetricsMiddleware
+from monitoring.slow import slow_query_log
+from monitoring.sql import SqlInstrumentationMiddleware, instrument_engine
+# Импорт регистрирует обработчики фоновых задач
+import orders.jobs  # noqa: F401
+import analytics.rollups  # noqa: F401
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Пул фоновых воркеров живет столько же, сколько приложение
+    job_pool.add_periodic(check_replica_lag, REPLICA_CHECK_INTERVAL)
+    job_pool.add_periodic(refresh_revocations, REVOCATION_REFRESH_INTERVAL)
+    job_pool.add_periodic(purge_expired_sessions, SESSION_PURGE_INTERVAL)
+    job_pool.add_periodic(purge_expired_keys, IDEMPOTENCY_PURGE_INTERVAL)
+    job_pool.add_periodic(release_expired_reservations, 60)
+    job_pool.add_periodic(maintain_order_partitions, PARTITION_MAINTENANCE_INTERVAL)
+    job_pool.add_periodic(compute_reorder_suggestions, REORDER_INTERVAL)
+    job_pool.add_periodic(refresh_queue_depth, QUEUE_DEPTH_REFRESH_INTERVAL)
+    await job_pool.start()
+    yield
+    await job_pool.stop()
+    hashing_pool.shutdown()
+    slow_query_log.close()
+
+# Счетчики запросов к базе для каждого HTTP-запроса и журнал медленных запросов
+instrument_engine(engine)
+slow_query_log.instrument(engine)
+if replica_engine is not None:
+    instrument_engine(replica_engine)
+    slow_query_log.instrument(replica_engine)
 
 app = FastAPI(
     title="Computer Store API",
     description="API для магазина компьютерной техники",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Настройки CORS
@@ -23,6 +70,15 @@ origins = [
     "http://127.0.0.1:3000",  # React dev server
 ]
 
+# Ограничение частоты запросов к входу и регистрации; добавлено раньше CORS,
+# чтобы ответы 429 тоже получали CORS-заголовки
+app.add_middleware(RateLimitMiddleware)
+# Пользователь после своей записи какое-то время читает с основной базы
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(SqlInstrumentationMiddleware)
+# Задержка и коды ответов по маршрутам для /metrics
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -36,9 +92,14 @@ app.include_router(auth_router)
 app.include_router(categories_router)
 app.include_router(products_router)
 app.include_router(orders_router)
+app.include_router(admin_orders_router)
 app.include_router(reviews_router)
 app.include_router(cart_router)
 app.include_router(suppliers_router)
+app.include_router(inventory_router)
+app.include_router(analytics_router)
+app.include_router(monitoring_router)
+app.include_router(metrics_router)
 
 @app.get("/")
 async def root():
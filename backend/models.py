@@ -1,6 +1,6 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
-from sqlalchemy import String, Integer, Float, ForeignKey, DateTime, Enum, Column, Boolean, Table, Text, func
+from sqlalchemy import String, Integer, Float, ForeignKey, Date, DateTime, Enum, Column, Boolean, Table, Text, UniqueConstraint, Index, JSON, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -10,8 +10,10 @@ Base = declarative_base()
 order_product = Table(
     'order_product',
     Base.metadata,
-    Column('order_id', Integer, ForeignKey('orders.id'), primary_key=True),
-    Column('product_id', Integer, ForeignKey('products.id'), primary_key=True),
+    # orders партиционирована по created_at, поэтому внешний ключ на orders.id невозможен:
+    # целостность поддерживается приложением (позиции удаляются вместе с заказом)
+    Column('order_id', Integer, primary_key=True),
+    Column('product_id', Integer, ForeignKey('products.id'), primary_key=True, index=True),
     Column('quantity', Integer, nullable=False),
     Column('price_at_time', Float, nullable=False)  # Цена продукта на момент заказа
 )
@@ -30,6 +32,7 @@ class User(Base):
     orders: Mapped[List["Order"]] = relationship("Order", back_populates="user")
     reviews: Mapped[List["Review"]] = relationship("Review", back_populates="user")
     cart_items: Mapped[List["CartItem"]] = relationship("CartItem", back_populates="user")
+    reservations: Mapped[List["StockReservation"]] = relationship("StockReservation", back_populates="user")
 
 class Product(Base):
     __tablename__ = "products"
@@ -50,7 +53,17 @@ class Product(Base):
     supplier: Mapped["Supplier"] = relationship("Supplier", back_populates="products")
     reviews: Mapped[List["Review"]] = relationship("Review", back_populates="product")
     cart_items: Mapped[List["CartItem"]] = relationship("CartItem", back_populates="product")
-    orders: Mapped[List["Order"]] = relationship("Order", secondary=order_product, back_populates="products")
+    orders: Mapped[List["Order"]] = relationship(
+        "Order",
+        secondary=order_product,
+        primaryjoin="Product.id == order_product.c.product_id",
+        secondaryjoin="Order.id == order_product.c.order_id",
+        back_populates="products"
+    )
+    # Резервы удаляются вместе с товаром внешним ключом ON DELETE CASCADE
+    reservations: Mapped[List["StockReservation"]] = relationship(
+        "StockReservation", back_populates="product", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 class Category(Base):
     __tablename__ = "categories"
@@ -70,36 +83,64 @@ class Category(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),  # История заказов пользователя
+        Index("ix_orders_status_created_at", "status", "created_at"),  # Поиск заказов для админов
+        {"postgresql_partition_by": "RANGE (created_at)"},  # Помесячные партиции, см. orders/partitions.py
+    )
     
-    id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    # Первичный ключ партиционированной таблицы обязан включать ключ партиционирования
+    id: Mapped[int] = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id: Mapped[int] = Column(Integer, ForeignKey("users.id"))
     status: Mapped[str] = Column(String, default="pending")
     total_amount: Mapped[float] = Column(Float)
     shipping_address: Mapped[str] = Column(String)
-    created_at: Mapped[datetime] = Column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), primary_key=True, default=datetime.utcnow)
     updated_at: Mapped[datetime] = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user: Mapped["User"] = relationship("User", back_populates="orders")
     products: Mapped[List["Product"]] = relationship(
         "Product",
         secondary=order_product,
+        primaryjoin="Order.id == order_product.c.order_id",
+        secondaryjoin="Product.id == order_product.c.product_id",
         back_populates="orders"
     )
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        # Лента отзывов товара: новые сначала и сортировки по оценке
+        Index("ix_reviews_product_id_created_at_id", "product_id", "created_at", "id"),
+        Index("ix_reviews_product_id_rating", "product_id", "rating", "created_at", "id"),
+        UniqueConstraint("user_id", "product_id", name="uq_reviews_user_product"),  # Один отзыв на товар от пользователя
+    )
 
     id: Mapped[int] = Column(Integer, primary_key=True, index=True)
     user_id: Mapped[int] = Column(Integer, ForeignKey("users.id"))
     product_id: Mapped[int] = Column(Integer, ForeignKey("products.id"))
     rating: Mapped[int] = Column(Integer)  # 1-5
     comment: Mapped[str] = Column(Text)
-    created_at: Mapped[datetime] = Column(DateTime(timezone=True), default=datetime.utcnow)
+    # Часть ключа курсорной пагинации, поэтому без NULL
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
     updated_at: Mapped[datetime] = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user: Mapped["User"] = relationship("User", back_populates="reviews")
     product: Mapped["Product"] = relationship("Product", back_populates="reviews")
 
+class ProductRatingStats(Base):
+    """Счетчики оценок товара, обновляются вместе с отзывами"""
+    __tablename__ = "product_rating_stats"
+
+    product_id: Mapped[int] = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    rating_1: Mapped[int] = Column(Integer, nullable=False, default=0)
+    rating_2: Mapped[int] = Column(Integer, nullable=False, default=0)
+    rating_3: Mapped[int] = Column(Integer, nullable=False, default=0)
+    rating_4: Mapped[int] = Column(Integer, nullable=False, default=0)
+    rating_5: Mapped[int] = Column(Integer, nullable=False, default=0)
+    review_count: Mapped[int] = Column(Integer, nullable=False, default=0)
+    rating_sum: Mapped[int] = Column(Integer, nullable=False, default=0)
+
 class CartItem(Base):
     __tablename__ = "cart_items"
 
@@ -113,6 +154,118 @@ class CartItem(Base):
     user: Mapped["User"] = relationship("User", back_populates="cart_items")
     product: Mapped["Product"] = relationship("Product", back_populates="cart_items")
 
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_stock_reservations_user_product"),
+    )
+
+    id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    user_id: Mapped[int] = Column(Integer, ForeignKey("users.id"), nullable=False)
+    product_id: Mapped[int] = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    quantity: Mapped[int] = Column(Integer, nullable=False)
+    expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, index=True)  # После этого момента резерв возвращается на склад
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+    user: Mapped["User"] = relationship("User", back_populates="reservations")
+    product: Mapped["Product"] = relationship("Product", back_populates="reservations")
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    user_id: Mapped[int] = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key: Mapped[str] = Column(String(255), primary_key=True)
+    request_hash: Mapped[str] = Column(String(64), nullable=False)  # sha256 тела запроса
+    response_status: Mapped[Optional[int]] = Column(Integer, nullable=True)
+    response_body: Mapped[Optional[dict]] = Column(JSON, nullable=True)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), default=datetime.utcnow)
+    expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class UserSession(Base):
+    """
+    Сессия входа: refresh-токен хранится только хешем. При обновлении строка
+    помечается rotated_at, и семейство продолжает новая строка; повторное
+    предъявление уже обмененного токена означает утечку и отзывает семейство.
+    """
+    __tablename__ = "sessions"
+
+    id: Mapped[int] = Column(Integer, primary_key=True)
+    user_id: Mapped[int] = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    family_id: Mapped[str] = Column(String(32), nullable=False, index=True)
+    token_hash: Mapped[str] = Column(String(64), nullable=False, unique=True)  # sha256 refresh-токена
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), default=datetime.utcnow)
+    expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, index=True)
+    rotated_at: Mapped[Optional[datetime]] = Column(DateTime(timezone=True), nullable=True)
+    revoked_at: Mapped[Optional[datetime]] = Column(DateTime(timezone=True), nullable=True)
+
+class RevokedToken(Base):
+    """
+    Отозванный токен доступа (jti) или отсечка по пользователю: все его токены,
+    выпущенные не позже revoked_before. Запись нужна, пока живы такие токены.
+    """
+    __tablename__ = "revoked_tokens"
+
+    id: Mapped[int] = Column(Integer, primary_key=True)
+    jti: Mapped[Optional[str]] = Column(String(64), nullable=True, unique=True)
+    user_id: Mapped[Optional[int]] = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    revoked_before: Mapped[Optional[datetime]] = Column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), default=datetime.utcnow)
+    expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),  # Выборка готовых к запуску задач
+    )
+
+    id: Mapped[int] = Column(Integer, primary_key=True)
+    type: Mapped[str] = Column(String, nullable=False)
+    payload: Mapped[dict] = Column(JSON, nullable=False, default=dict)
+    status: Mapped[str] = Column(String, nullable=False, default="pending")  # pending | running | failed
+    attempts: Mapped[int] = Column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = Column(Integer, nullable=False, default=5)
+    run_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    locked_at: Mapped[Optional[datetime]] = Column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[Optional[str]] = Column(Text, nullable=True)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+# --- Дневные агрегаты продаж (обновляются инкрементально фоновыми задачами) ---
+
+class SalesDaily(Base):
+    __tablename__ = "sales_daily"
+
+    day: Mapped[date] = Column(Date, primary_key=True)
+    orders: Mapped[int] = Column(Integer, nullable=False, default=0)
+    units: Mapped[int] = Column(Integer, nullable=False, default=0)
+    revenue: Mapped[float] = Column(Float, nullable=False, default=0)
+
+class SalesDailyProduct(Base):
+    __tablename__ = "sales_daily_product"
+
+    day: Mapped[date] = Column(Date, primary_key=True)
+    product_id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    orders: Mapped[int] = Column(Integer, nullable=False, default=0)
+    units: Mapped[int] = Column(Integer, nullable=False, default=0)
+    revenue: Mapped[float] = Column(Float, nullable=False, default=0)
+
+class SalesDailyCategory(Base):
+    __tablename__ = "sales_daily_category"
+
+    day: Mapped[date] = Column(Date, primary_key=True)
+    category_id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    orders: Mapped[int] = Column(Integer, nullable=False, default=0)
+    units: Mapped[int] = Column(Integer, nullable=False, default=0)
+    revenue: Mapped[float] = Column(Float, nullable=False, default=0)
+
+class SalesDailySupplier(Base):
+    __tablename__ = "sales_daily_supplier"
+
+    day: Mapped[date] = Column(Date, primary_key=True)
+    supplier_id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    orders: Mapped[int] = Column(Integer, nullable=False, default=0)
+    units: Mapped[int] = Column(Integer, nullable=False, default=0)
+    revenue: Mapped[float] = Column(Float, nullable=False, default=0)
+
 class Supplier(Base):
     __tablename__ = "suppliers"
     
@@ -126,11 +279,59 @@ class Supplier(Base):
     updated_at: Mapped[datetime] = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     
     products: Mapped[List["Product"]] = relationship("Product", back_populates="supplier")
+    # История поставок удаляется вместе с поставщиком (ON DELETE CASCADE)
+    deliveries: Mapped[List["SupplierDelivery"]] = relationship(
+        "SupplierDelivery", back_populates="supplier", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+class SupplierDelivery(Base):
+    """Поставка: применяется к остаткам одним запросом по накладной"""
+    __tablename__ = "supplier_deliveries"
+
+    id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    supplier_id: Mapped[int] = Column(Integer, ForeignKey("suppliers.id", ondelete="CASCADE"), nullable=False, index=True)
+    delivered_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False)
+    line_count: Mapped[int] = Column(Integer, nullable=False)  # строк в накладной
+    matched_count: Mapped[int] = Column(Integer, nullable=False)  # строк, примененных к товарам поставщика
+    total_cost: Mapped[float] = Column(Float, nullable=False)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+    supplier: Mapped["Supplier"] = relationship("Supplier", back_populates="deliveries")
+    lines: Mapped[List["SupplierDeliveryLine"]] = relationship(
+        "SupplierDeliveryLine", back_populates="delivery", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+class SupplierDeliveryLine(Base):
+    __tablename__ = "supplier_delivery_lines"
+
+    delivery_id: Mapped[int] = Column(Integer, ForeignKey("supplier_deliveries.id", ondelete="CASCADE"), primary_key=True)
+    # Строки удаленного товара уходят из накладной; line_count поставки остается прежним
+    product_id: Mapped[int] = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    quantity: Mapped[int] = Column(Integer, nullable=False)
+    supply_price: Mapped[float] = Column(Float, nullable=False)
+
+    delivery: Mapped["SupplierDelivery"] = relationship("SupplierDelivery", back_populates="lines")
+
+class ReorderSuggestion(Base):
+    """Рекомендация дозаказа, пересчитывается периодически по скорости продаж"""
+    __tablename__ = "reorder_suggestions"
+
+    # Рекомендации производны от продаж и пересчитываются, поэтому удаляются каскадом
+    product_id: Mapped[int] = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    supplier_id: Mapped[int] = Column(Integer, ForeignKey("suppliers.id", ondelete="CASCADE"), nullable=False, index=True)
+    stock: Mapped[int] = Column(Integer, nullable=False)
+    daily_velocity: Mapped[float] = Column(Float, nullable=False)  # средние продажи в день, шт.
+    lead_time_days: Mapped[float] = Column(Float, nullable=False)
+    reorder_point: Mapped[float] = Column(Float, nullable=False)
+    suggested_quantity: Mapped[int] = Column(Integer, nullable=False)
+    days_of_cover: Mapped[float] = Column(Float, nullable=False)  # на сколько дней хватит остатка
+    computed_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False)
 
 class OrderProduct(Base):
     __tablename__ = "order_products"
 
-    order_id: Mapped[int] = Column(Integer, ForeignKey("orders.id"), primary_key=True)
+    # Как и в order_product, внешнего ключа на партиционированную orders нет
+    order_id: Mapped[int] = Column(Integer, primary_key=True)
     product_id: Mapped[int] = Column(Integer, ForeignKey("products.id"), primary_key=True)
     quantity: Mapped[int] = Column(Integer, default=1)
     price_at_time: Mapped[float] = Column(Float)  # Цена товара на момент заказа 
\ No newline at end of file
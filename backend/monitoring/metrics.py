@@ -0,0 +1,139 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .sql import route_template
+
+# Границы корзин по умолчанию, как в клиентских библиотеках Prometheus (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+class Histogram:
+    """Гистограмма Prometheus с метками; наблюдение — поиск корзины и два сложения"""
+
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        # метки -> [счетчики по корзинам (+Inf последней), сумма]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_labels(self.label_names + ('le',), labels + (le,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}"
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values: Dict[Labels, float] = defaultdict(float)
+
+    def inc(self, labels: Labels = (), value: float = 1) -> None:
+        self._values[labels] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.label_names, labels)} {value}"
+
+def gauge(name: str, help: str, values: Dict[Labels, float], label_names: Tuple[str, ...] = ()) -> List[str]:
+    """Значения, которые вычисляются в момент выгрузки"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    lines += [f"{name}{_labels(label_names, labels)} {value}" for labels, value in values.items()]
+    return lines
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Labels) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route")
+)
+responses = Counter(
+    "http_responses_total", "HTTP responses by route template and status code",
+    ("method", "route", "status")
+)
+pool_checkout_wait = Histogram(
+    "db_pool_checkout_seconds", "Time to obtain a database connection from the pool",
+    ("engine",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+class InFlight:
+    requests = 0
+
+in_flight = InFlight()
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул asyncpg, замеряющий ожидание соединения (включая создание нового и pre-ping).
+    Метка engine — pool_logging_name движка.
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            engine = getattr(self, "logging_name", None) or "default"
+            pool_checkout_wait.observe(time.perf_counter() - started, (engine,))
+
+class MetricsMiddleware:
+    """
+    Задержка, число ответов по кодам и запросы в обработке. Метки — шаблон
+    маршрута, а не путь, чтобы число рядов не росло с числом id.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+        in_flight.requests += 1
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.requests -= 1
+            labels = (scope["method"], route_template(scope))
+            request_duration.observe(time.perf_counter() - started, labels)
+            responses.inc(labels + (str(status_code),))
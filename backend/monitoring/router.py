@@ -0,0 +1,133 @@
+import hmac
+import ipaddress
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse
+
+from auth.security import Principal, get_admin_user
+from auth.hashing import hashing_pool
+from cache import caches
+from database import engine, replica_engine, pool_stats
+from jobs.queue import pending_jobs
+from ratelimit.middleware import rejections
+from settings import monitoring_settings
+from .metrics import Counter, gauge, in_flight, pool_checkout_wait, request_duration, responses
+from .slow import slow_query_log
+from .sql import sql_report
+
+router = APIRouter(prefix="/monitoring", tags=["monitoring"])
+# /metrics без префикса и без пользовательской авторизации — так его ожидает Prometheus
+metrics_router = APIRouter(tags=["monitoring"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/sql")
+async def get_sql_stats(
+    _: Principal = Depends(get_admin_user)
+) -> list:
+    """
+    Запросы к базе по маршрутам с момента старта процесса (только для админов):
+    среднее и максимальное число запросов, время в базе и число запросов с вероятным N+1.
+    """
+    return sql_report()
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    _: Principal = Depends(get_admin_user)
+) -> dict:
+    """
+    Медленные запросы этого процесса (только для админов): формы запросов по
+    суммарному времени с маршрутами и последним планом, и последние случаи.
+    """
+    return slow_query_log.report(limit)
+
+@router.get("/caches")
+async def get_cache_stats(
+    _: Principal = Depends(get_admin_user)
+) -> dict:
+    """Попадания и промахи кэшей процесса (только для админов)"""
+    return {name: cache.stats() for name, cache in caches.items()}
+
+@router.get("/hashing")
+async def get_hashing_stats(
+    _: Principal = Depends(get_admin_user)
+) -> dict:
+    """Загрузка пула хеширования паролей: очередь, выполненные и отклоненные операции (только для админов)"""
+    return hashing_pool.stats()
+
+@router.get("/pool")
+async def get_pool_stats(
+    _: Principal = Depends(get_admin_user)
+) -> dict:
+    """Пул соединений с базой в этом процессе: занятые, свободные и сверх pool_size (только для админов)"""
+    return pool_stats()
+
+def require_metrics_access(request: Request) -> None:
+    """
+    С METRICS_TOKEN — только запросы с заголовком Authorization: Bearer <токен>.
+    Без него — только клиенты из частных сетей и localhost; за прокси клиентом
+    считается сам прокси, поэтому снаружи /metrics нужно закрыть и на нем.
+    """
+    token = monitoring_settings.metrics_token
+    if token is not None:
+        scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(credentials.encode(), token.encode()):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid metrics token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return
+    try:
+        address = ipaddress.ip_address(request.client.host if request.client else "")
+    except ValueError:
+        address = None
+    if address is None or not (address.is_private or address.is_loopback):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Metrics are available only from the internal network"
+        )
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+async def get_metrics() -> PlainTextResponse:
+    """Метрики процесса в текстовом формате Prometheus; база не запрашивается"""
+    lines = [
+        *request_duration.render(),
+        *responses.render(),
+        *gauge("http_requests_in_flight", "HTTP requests being processed", {(): in_flight.requests}),
+        *pool_checkout_wait.render(),
+    ]
+
+    pools = {}
+    for name, target in (("primary", engine), ("replica", replica_engine)):
+        if target is None:
+            continue
+        pool = pool_stats(target)
+        for state in ("checked_in", "checked_out", "overflow"):
+            pools[(name, state)] = pool[state]
+    lines += gauge("db_pool_connections", "Database pool connections by state", pools, ("engine", "state"))
+
+    cache_hits = Counter("cache_hits_total", "Cache hits", ("cache",))
+    cache_misses = Counter("cache_misses_total", "Cache misses", ("cache",))
+    cache_sizes = {}
+    for name, cache in caches.items():
+        cache_stats = cache.stats()
+        cache_hits.inc((name,), cache_stats["hits"])
+        cache_misses.inc((name,), cache_stats["misses"])
+        cache_sizes[(name,)] = cache_stats["size"]
+    lines += [*cache_hits.render(), *cache_misses.render()]
+    lines += gauge("cache_entries", "Entries currently cached", cache_sizes, ("cache",))
+
+    hashing = hashing_pool.stats()
+    lines += gauge("password_hashing_queued", "Password hashing calls waiting for a worker", {(): hashing["queued"]})
+
+    rate_limited = Counter("rate_limit_rejections_total", "Requests rejected by rate limiting", ("policy",))
+    for policy, count in rejections.items():
+        rate_limited.inc((policy,), count)
+    lines += rate_limited.render()
+
+    # Замер периодической задачи refresh_queue_depth, не старше QUEUE_DEPTH_REFRESH_INTERVAL
+    lines += gauge("job_queue_depth", "Pending background jobs by type", {(job_type,): count for job_type, count in pending_jobs.items()}, ("type",))
+
+    return PlainTextResponse("\n".join(lines) + "\n", media_type=PROMETHEUS_CONTENT_TYPE)
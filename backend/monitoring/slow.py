@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from settings import monitoring_settings
+from .sql import request_sql_stats, route_template, statement_shape
+
+logger = logging.getLogger(__name__)
+
+# Сколько может выполняться EXPLAIN ANALYZE, прежде чем база его прервет
+EXPLAIN_TIMEOUT_MS = 10000
+# EXPLAIN ANALYZE выполняет запрос заново, поэтому снимается только для чтения
+_LOCKING_CLAUSES = ("FOR UPDATE", "FOR NO KEY UPDATE", "FOR SHARE", "FOR KEY SHARE")
+
+# Истина внутри задачи, снимающей EXPLAIN
+_in_explain: ContextVar[bool] = ContextVar("in_explain", default=False)
+
+@dataclass
+class SlowQuery:
+    at: str
+    route: str  # шаблон маршрута или "background" для фоновых задач
+    duration_ms: float
+    statement: str
+    parameters: Any  # типы параметров без значений
+    plan: Optional[str] = None
+
+@dataclass
+class SlowQueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    routes: Counter = field(default_factory=Counter)
+    last_plan: Optional[str] = None
+
+def parameters_shape(parameters, executemany: bool = False) -> Any:
+    """Типы параметров вместо значений: в журнал не попадают пароли и персональные данные"""
+    if executemany:
+        return {"rows": len(parameters), "row": parameters_shape(parameters[0]) if parameters else None}
+    if isinstance(parameters, dict):
+        return {name: _value_type(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_value_type(value) for value in parameters]
+    return None
+
+def _value_type(value) -> str:
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+def _explainable(statement: str) -> bool:
+    text = statement.lstrip().upper()
+    return text.startswith("SELECT") and not any(clause in text for clause in _LOCKING_CLAUSES)
+
+class SlowQueryLog:
+    """
+    Запросы дольше slow_query_ms: последние slow_query_buffer штук в памяти,
+    сводка по формам запросов и, если задан slow_query_log, журнал в файле —
+    его пишет отдельный поток, а не цикл событий. Для доли SELECT отдельным
+    соединением снимается EXPLAIN (ANALYZE, BUFFERS) — не больше одного за раз,
+    чтобы деградация базы не усиливалась повторными выполнениями.
+    """
+
+    def __init__(self, buffer_size: int, log_path: Optional[str]):
+        self.recent: Deque[SlowQuery] = deque(maxlen=buffer_size)
+        self.by_shape: Dict[str, SlowQueryStats] = defaultdict(SlowQueryStats)
+        self._explaining = False
+        # Ссылки на задачи EXPLAIN: цикл событий держит только слабые
+        self._tasks: Set[asyncio.Task] = set()
+        self._file_logger = logging.getLogger("slow_queries")
+        self._file_logger.propagate = False
+        self._listener: Optional[QueueListener] = None
+        if log_path:
+            handler = logging.FileHandler(log_path, delay=True, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            records: queue.SimpleQueue = queue.SimpleQueue()
+            self._listener = QueueListener(records, handler)
+            self._listener.start()
+            self._file_logger.addHandler(QueueHandler(records))
+            self._file_logger.setLevel(logging.INFO)
+
+    def instrument(self, engine: AsyncEngine) -> None:
+        """Подписаться на запросы движка; время начала ставит monitoring.sql.instrument_engine"""
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+            if _in_explain.get():
+                return
+            duration_ms = (time.perf_counter() - context._query_started) * 1000
+            if duration_ms >= monitoring_settings.slow_query_ms:
+                self.record(engine, statement, parameters, executemany, duration_ms)
+
+        event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+
+    def record(self, engine: AsyncEngine, statement: str, parameters, executemany: bool, duration_ms: float) -> None:
+        stats = request_sql_stats.get()
+        route = route_template(stats.scope) if stats is not None and stats.scope is not None else "background"
+        query = SlowQuery(
+            at=datetime.now(timezone.utc).isoformat(),
+            route=route,
+            duration_ms=round(duration_ms, 1),
+            statement=statement,
+            parameters=parameters_shape(parameters, executemany),
+        )
+        self.recent.append(query)
+
+        shape = self.by_shape[statement_shape(statement)]
+        shape.count += 1
+        shape.total_ms += duration_ms
+        shape.max_ms = max(shape.max_ms, duration_ms)
+        shape.routes[route] += 1
+
+        if (
+            not executemany
+            and not self._explaining
+            and _explainable(statement)
+            and random.random() < monitoring_settings.slow_query_explain_rate
+        ):
+            self._explaining = True
+            task = asyncio.get_running_loop().create_task(self._explain(engine, query, parameters, shape))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            self._write(query)
+
+    async def _explain(self, engine: AsyncEngine, query: SlowQuery, parameters, shape: SlowQueryStats) -> None:
+        # Задача наследует контекст HTTP-запроса: ее запросы не должны попасть ни
+        # в статистику запроса, ни обратно в журнал медленных
+        request_sql_stats.set(None)
+        _in_explain.set(True)
+        try:
+            async with engine.connect() as conn:
+                # Транзакция не коммитится: EXPLAIN ANALYZE откатывается вместе с ней
+                await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+                result = await conn.exec_driver_sql(
+                    "EXPLAIN (ANALYZE, BUFFERS) " + query.statement, parameters or ()
+                )
+                query.plan = "\n".join(row[0] for row in result)
+                shape.last_plan = query.plan
+        except Exception:
+            logger.exception("EXPLAIN of a slow query failed")
+        finally:
+            self._explaining = False
+            self._write(query)
+
+    def _write(self, query: SlowQuery) -> None:
+        self._file_logger.info(json.dumps(asdict(query), ensure_ascii=False, default=str))
+
+    def close(self) -> None:
+        """Дописать журнал в файл и остановить его поток"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def report(self, limit: int) -> dict:
+        """Формы запросов по суммарному времени и последние медленные запросы"""
+        top = sorted(self.by_shape.items(), key=lambda item: item[1].total_ms, reverse=True)[:limit]
+        return {
+            "threshold_ms": monitoring_settings.slow_query_ms,
+            "top": [
+                {
+                    "statement": shape,
+                    "count": stats.count,
+                    "total_ms": round(stats.total_ms, 1),
+                    "avg_ms": round(stats.total_ms / stats.count, 1),
+                    "max_ms": round(stats.max_ms, 1),
+                    "routes": dict(stats.routes.most_common(5)),
+                    "plan": stats.last_plan,
+                }
+                for shape, stats in top
+            ],
+            "recent": [asdict(query) for query in reversed(self.recent)][:limit],
+        }
+
+slow_query_log = SlowQueryLog(monitoring_settings.slow_query_buffer, monitoring_settings.slow_query_log)
@@ -0,0 +1,134 @@
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from settings import monitoring_settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RequestSqlStats:
+    """Запросы к базе в рамках одного HTTP-запроса"""
+    queries: int = 0
+    db_time: float = 0.0  # секунды
+    shapes: Counter = field(default_factory=Counter)
+    scope: Optional[Dict[str, Any]] = None  # ASGI scope, чтобы узнать маршрут
+
+@dataclass
+class RouteSqlStats:
+    requests: int = 0
+    queries: int = 0
+    db_time: float = 0.0
+    max_queries: int = 0
+    n_plus_one_requests: int = 0  # запросы, где форма повторилась не меньше порога
+
+# Статистика текущего HTTP-запроса; вне запросов (фоновые задачи) — None
+request_sql_stats: ContextVar[Optional[RequestSqlStats]] = ContextVar("request_sql_stats", default=None)
+# Накопленная статистика по шаблонам маршрутов ("/products/{product_id}")
+route_sql_stats: Dict[str, RouteSqlStats] = defaultdict(RouteSqlStats)
+# (маршрут, форма запроса), о которых уже предупреждали
+_warned: Set[Tuple[str, str]] = set()
+
+_PLACEHOLDER = re.compile(r"\$\d+(?:::[A-Z_]+(?: WITH(?:OUT)? TIME ZONE)?(?:\[\])?)?|%\(\w+\)s")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACES = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """Текст запроса без параметров: списки значений любой длины дают одну форму"""
+    shape = _PLACEHOLDER.sub("?", statement)
+    shape = _PLACEHOLDER_LIST.sub("?, ...", shape)
+    return _SPACES.sub(" ", shape).strip()[:1000]
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    context._query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = request_sql_stats.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.db_time += time.perf_counter() - context._query_started
+    stats.shapes[statement_shape(statement)] += 1
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подписаться на выполнение запросов движка; события срабатывают в контексте запроса"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+def route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class SqlInstrumentationMiddleware:
+    """
+    Считает запросы к базе и их время для каждого HTTP-запроса, отдает их
+    в заголовке Server-Timing и копит по маршрутам. Если одна форма запроса
+    повторилась не меньше n_plus_one_threshold раз, пишет предупреждение
+    (один раз на маршрут и форму).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSqlStats(scope=scope)
+        token = request_sql_stats.set(stats)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timing = f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_sql_stats.reset(token)
+            self._record(route_template(scope), stats)
+
+    def _record(self, route: str, stats: RequestSqlStats) -> None:
+        aggregate = route_sql_stats[route]
+        aggregate.requests += 1
+        aggregate.queries += stats.queries
+        aggregate.db_time += stats.db_time
+        aggregate.max_queries = max(aggregate.max_queries, stats.queries)
+
+        threshold = monitoring_settings.n_plus_one_threshold
+        repeated = [(shape, count) for shape, count in stats.shapes.items() if count >= threshold]
+        if not repeated:
+            return
+        aggregate.n_plus_one_requests += 1
+        for shape, count in repeated:
+            if (route, shape) not in _warned:
+                _warned.add((route, shape))
+                logger.warning("Possible N+1 on %s: %d executions of %s", route, count, shape)
+
+def sql_report() -> list:
+    """Маршруты по суммарному времени в базе, самые затратные сначала"""
+    return [
+        {
+            "route": route,
+            "requests": stats.requests,
+            "avg_queries": stats.queries / stats.requests,
+            "max_queries": stats.max_queries,
+            "avg_db_ms": stats.db_time * 1000 / stats.requests,
+            "total_db_ms": stats.db_time * 1000,
+            "n_plus_one_requests": stats.n_plus_one_requests,
+        }
+        for route, stats in sorted(route_sql_stats.items(), key=lambda item: item[1].db_time, reverse=True)
+        if stats.requests
+    ]
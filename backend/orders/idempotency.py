@@ -0,0 +1,107 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update, delete, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+
+from models import IdempotencyKey
+
+# Сколько хранится сохраненный ответ для повторов
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# Сколько повтор ждет завершения первого запроса с тем же ключом
+IDEMPOTENCY_WAIT_TIMEOUT = "10s"
+# Как часто удаляются просроченные ключи (в секундах)
+IDEMPOTENCY_PURGE_INTERVAL = 600
+
+def request_fingerprint(payload: dict) -> str:
+    """sha256 от канонического JSON тела запроса"""
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+async def claim_key(
+    db: AsyncSession,
+    user_id: int,
+    key: str,
+    request_hash: str
+) -> Optional[IdempotencyKey]:
+    """
+    Захватить ключ в текущей транзакции.
+
+    Возвращает None, если ключ захвачен этим запросом (работу нужно выполнить),
+    иначе — запись с сохраненным ответом. Параллельный дубликат блокируется
+    на уникальном индексе до коммита первого запроса и получает его результат;
+    если первый запрос откатился, дубликат сам захватывает ключ.
+    """
+    now = datetime.utcnow()
+    stmt = pg_insert(IdempotencyKey).values(
+        user_id=user_id,
+        key=key,
+        request_hash=request_hash,
+        created_at=now,
+        expires_at=now + IDEMPOTENCY_KEY_TTL
+    )
+    # Просроченный, но еще не удаленный ключ можно захватить заново
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "response_status": None,
+            "response_body": None,
+            "created_at": stmt.excluded.created_at,
+            "expires_at": stmt.excluded.expires_at,
+        },
+        where=IdempotencyKey.expires_at <= now
+    ).returning(IdempotencyKey.key)
+
+    await db.execute(text(f"SET LOCAL lock_timeout = '{IDEMPOTENCY_WAIT_TIMEOUT}'"))
+    try:
+        claimed = (await db.execute(stmt)).scalar_one_or_none()
+    except DBAPIError as e:
+        if getattr(e.orig, "sqlstate", None) != "55P03":  # lock_not_available
+            raise
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still being processed"
+        )
+    await db.execute(text("SET LOCAL lock_timeout = DEFAULT"))
+
+    if claimed is not None:
+        return None
+
+    stmt = select(IdempotencyKey).where(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key
+    )
+    record = (await db.execute(stmt)).scalar_one()
+    if record.request_hash != request_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request"
+        )
+    return record
+
+async def store_response(
+    db: AsyncSession,
+    user_id: int,
+    key: str,
+    body: dict,
+    status_code: int = status.HTTP_200_OK
+) -> None:
+    """Сохранить ответ в той же транзакции, что и результат работы"""
+    stmt = update(IdempotencyKey).where(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key
+    ).values(response_status=status_code, response_body=body)
+    await db.execute(stmt)
+
+async def purge_expired_keys(db: AsyncSession) -> int:
+    """Удалить просроченные ключи (периодическая задача пула воркеров)"""
+    stmt = delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())
+    result = await db.execute(stmt)
+    return result.rowcount
@@ -0,0 +1,22 @@
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from jobs.queue import job_handler
+from models import Order
+
+logger = logging.getLogger(__name__)
+
+@job_handler("order.created", concurrency=4)
+async def notify_order_created(db: AsyncSession, payload: dict) -> None:
+    """Уведомление о новом заказе (выполняется после ответа клиенту)"""
+    stmt = select(Order.id, Order.user_id, Order.total_amount).where(Order.id == payload["order_id"])
+    order = (await db.execute(stmt)).first()
+    if order is None:
+        # Заказ успели отменить — уведомлять не о чем
+        return
+    logger.info(
+        "Order %s created by user %s for %.2f",
+        order.id, order.user_id, order.total_amount
+    )
@@ -0,0 +1,111 @@
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Сколько месяцев вперед держать готовые партиции
+PARTITION_MONTHS_AHEAD = 3
+# Сколько месяцев заказы остаются в рабочей таблице до переноса в схему archive
+ARCHIVE_AFTER_MONTHS = 24
+# Как часто выполняется обслуживание партиций (в секундах)
+PARTITION_MAINTENANCE_INTERVAL = 6 * 3600
+
+ARCHIVE_SCHEMA = "archive"
+DEFAULT_PARTITION = "orders_default"
+_PARTITION_NAME = re.compile(r"^orders_p(\d{4})(\d{2})$")
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"orders_p{month:%Y%m}"
+
+async def create_partition(db: AsyncSession, month: date) -> None:
+    """
+    Создать партицию orders за месяц, если ее еще нет. Заказы этого месяца,
+    попавшие в партицию по умолчанию (она не дает создать пересекающуюся
+    партицию), переносятся в новую: она создается отдельной таблицей,
+    заполняется и присоединяется.
+    """
+    name = partition_name(month)
+    if (await db.execute(text("SELECT to_regclass(:name)"), {"name": name})).scalar() is not None:
+        return
+
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    in_range = f"created_at >= '{start}' AND created_at < '{end}'"
+    stray = (await db.execute(text(
+        f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE {in_range}"
+    ))).scalar()
+    if not stray:
+        await db.execute(text(f"CREATE TABLE {name} PARTITION OF orders {bounds}"))
+        return
+
+    logger.warning(
+        "%d orders for %s are in %s; moving them to a new partition",
+        stray, month.strftime("%Y-%m"), DEFAULT_PARTITION
+    )
+    await db.execute(text(f"CREATE TABLE {name} (LIKE orders INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    await db.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_range} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    await db.execute(text(f"ALTER TABLE orders ATTACH PARTITION {name} {bounds}"))
+
+async def list_partitions(db: AsyncSession) -> List[date]:
+    """Месяцы, для которых есть помесячные партиции orders"""
+    result = await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'orders'::regclass"
+    ))
+    months = []
+    for (name,) in result.all():
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+async def archive_partition(db: AsyncSession, month: date) -> None:
+    """
+    Отсоединить партицию и перенести ее в схему archive вместе с позициями заказов.
+    Запросы к orders после этого не видят архивные заказы и не сканируют их индексы.
+    """
+    name = partition_name(month)
+    await db.execute(text(f"ALTER TABLE orders DETACH PARTITION {name}"))
+    await db.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+    await db.execute(text(
+        f"INSERT INTO {ARCHIVE_SCHEMA}.order_product "
+        f"SELECT op.* FROM order_product op JOIN {ARCHIVE_SCHEMA}.{name} o ON o.id = op.order_id"
+    ))
+    await db.execute(text(
+        f"DELETE FROM order_product op USING {ARCHIVE_SCHEMA}.{name} o WHERE o.id = op.order_id"
+    ))
+
+async def maintain_order_partitions(db: AsyncSession) -> None:
+    """
+    Периодическое обслуживание: создать партиции на PARTITION_MONTHS_AHEAD
+    месяцев вперед и заархивировать партиции старше ARCHIVE_AFTER_MONTHS.
+    Транзакцию фиксирует планировщик; одновременно работает только один процесс.
+    """
+    locked = (await db.execute(text(
+        "SELECT pg_try_advisory_xact_lock(hashtext('orders_partitions'))"
+    ))).scalar()
+    if not locked:
+        return
+
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    for offset in range(PARTITION_MONTHS_AHEAD + 1):
+        await create_partition(db, add_months(current, offset))
+
+    cutoff = add_months(current, -ARCHIVE_AFTER_MONTHS)
+    for month in await list_partitions(db):
+        if month < cutoff:
+            logger.info("Archiving orders partition %s", partition_name(month))
+            await archive_partition(db, month)
@@ -1,31 +1,57 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, insert
+from sqlalchemy import select, and_, insert, update, delete, tuple_
 from datetime import datetime
 
 from database import get_db
-from models import Order, Product, User, CartItem, order_product
-from auth.security import get_current_active_user
+from pagination import Page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from models import Order, OrderProduct, Product, CartItem, order_product
+from auth.security import Principal, get_current_active_principal, get_admin_user
+from inventory.reservations import decrement_stock, restock, take_user_reservations
+from jobs.queue import enqueue
+from analytics.rollups import sales_day
+from .idempotency import claim_key, store_response, request_fingerprint
 from .schemas import (
     OrderCreate,
     OrderUpdate,
     Order as OrderSchema,
+    OrderItem,
     OrderWithProducts
 )
 
 router = APIRouter(prefix="/orders", tags=["orders"])
+admin_router = APIRouter(prefix="/admin/orders", tags=["admin"])
 
-@router.get("/", response_model=List[OrderSchema])
+@router.get("/", response_model=Page[OrderSchema])
 async def get_orders(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-) -> List[Order]:
-    """Получить список заказов пользователя"""
-    stmt = select(Order).where(Order.user_id == current_user.id)
+    current_user: Principal = Depends(get_current_active_principal)
+) -> Page[OrderSchema]:
+    """Получить историю заказов пользователя (новые сначала, keyset-пагинация по (created_at, id))"""
+    stmt = (
+        select(Order)
+        .where(Order.user_id == current_user.id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        created_at, order_id = decode_cursor(cursor, datetime, int)
+        # Партиции отсекаются по простому условию на created_at, но не по сравнению строк
+        stmt = stmt.where(
+            Order.created_at <= created_at,
+            tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id)
+        )
     result = await db.execute(stmt)
     orders = result.scalars().all()
     
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1].created_at, orders[-1].id)
+    
     # Убедимся, что у всех заказов есть значения created_at и updated_at
     for order in orders:
         if order.created_at is None:
@@ -33,79 +59,136 @@ async def get_orders(
         if order.updated_at is None:
             order.updated_at = datetime.utcnow()
     
-    return orders
+    return Page[OrderSchema](
+        items=[OrderSchema.model_validate(order) for order in orders],
+        next_cursor=next_cursor
+    )
 
 @router.get("/{order_id}", response_model=OrderWithProducts)
 async def get_order(
     order_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-) -> Order:
-    """Получить информацию о конкретном заказе"""
-    stmt = select(Order).where(
-        and_(
-            Order.id == order_id,
-            Order.user_id == current_user.id
+    current_user: Principal = Depends(get_current_active_principal)
+) -> OrderWithProducts:
+    """Получить информацию о конкретном заказе вместе с позициями (одним запросом)"""
+    stmt = (
+        select(
+            Order,
+            order_product.c.product_id,
+            order_product.c.quantity,
+            order_product.c.price_at_time,
+            Product.name
+        )
+        .outerjoin(order_product, order_product.c.order_id == Order.id)
+        .outerjoin(Product, Product.id == order_product.c.product_id)
+        .where(
+            and_(
+                Order.id == order_id,
+                Order.user_id == current_user.id
+            )
         )
+        .order_by(order_product.c.product_id)
     )
     result = await db.execute(stmt)
-    order = result.scalar_one_or_none()
+    rows = result.all()
     
-    if order is None:
+    if not rows:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
     
+    order = rows[0].Order
     # Убедимся, что у заказа есть значения created_at и updated_at
     if order.created_at is None:
         order.created_at = datetime.utcnow()
     if order.updated_at is None:
         order.updated_at = datetime.utcnow()
     
-    return order
+    items = [
+        OrderItem(
+            product_id=row.product_id,
+            name=row.name,
+            quantity=row.quantity,
+            price_at_time=row.price_at_time
+        )
+        for row in rows
+        if row.product_id is not None
+    ]
+    return OrderWithProducts(
+        **OrderSchema.model_validate(order).model_dump(),
+        products=items
+    )
 
 @router.post("/", response_model=OrderSchema)
 async def create_order(
     order_data: OrderCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_principal)
 ) -> Order:
-    """Создать новый заказ"""
-    # Получаем все товары из корзины пользователя
-    stmt = select(CartItem).where(CartItem.user_id == current_user.id)
+    """Создать новый заказ (поддерживает заголовок Idempotency-Key для безопасных повторов)"""
+    if idempotency_key is not None:
+        record = await claim_key(
+            db, current_user.id, idempotency_key, request_fingerprint(order_data.model_dump())
+        )
+        if record is not None:
+            if record.response_body is None:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still being processed"
+                )
+            response.headers["Idempotent-Replayed"] = "true"
+            return record.response_body
+    
+    # Получаем корзину пользователя вместе с ценами товаров одним запросом
+    stmt = (
+        select(CartItem.product_id, CartItem.quantity, Product.name, Product.price)
+        .outerjoin(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == current_user.id)
+    )
     result = await db.execute(stmt)
-    cart_items = result.scalars().all()
+    cart_lines = result.all()
     
-    if not cart_items:
+    if not cart_lines:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cart is empty"
         )
     
-    # Проверяем наличие всех товаров и считаем общую сумму
+    # Считаем общую сумму и количество по каждому товару
     total_amount = 0
-    products_to_update = []
-    
-    for cart_item in cart_items:
-        stmt = select(Product).where(Product.id == cart_item.product_id)
-        result = await db.execute(stmt)
-        product = result.scalar_one_or_none()
-        
-        if not product:
+    lines = {}
+    products = {}
+    for line in cart_lines:
+        if line.price is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Product {cart_item.product_id} not found"
+                detail=f"Product {line.product_id} not found"
             )
-        
-        if product.stock < cart_item.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Not enough stock for product {product.name}"
+        total_amount += line.price * line.quantity
+        lines[line.product_id] = lines.get(line.product_id, 0) + line.quantity
+        products[line.product_id] = line
+    
+    # Резервы пользователя уже списаны со склада — забираем их в счет заказа,
+    # а остаток списываем условным UPDATE (без чтения и записи stock в Python)
+    held = await take_user_reservations(db, current_user.id)
+    shortages = await decrement_stock(
+        db, {product_id: quantity - held.get(product_id, 0) for product_id, quantity in lines.items()}
+    )
+    if shortages:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="; ".join(
+                f"Not enough stock for product {products[s.product_id].name}: "
+                f"requested {lines[s.product_id]}, available {(s.available or 0) + held.get(s.product_id, 0)}"
+                for s in shortages
             )
-        
-        total_amount += product.price * cart_item.quantity
-        products_to_update.append((product, cart_item.quantity))
+        )
+    # Излишек резерва (корзину уменьшили после резервирования) возвращаем на склад
+    await restock(db, {product_id: quantity - lines.get(product_id, 0) for product_id, quantity in held.items()})
     
     # Создаем заказ
     now = datetime.utcnow()
@@ -120,26 +203,41 @@ async def create_order(
     db.add(order)
     await db.flush()
     
-    # Добавляем товары в заказ и обновляем количество на складе
-    for product, quantity in products_to_update:
-        # Добавляем связь в таблицу order_product
-        stmt = insert(order_product).values(
-            order_id=order.id,
-            product_id=product.id,
-            quantity=quantity,
-            price_at_time=product.price
-        )
-        await db.execute(stmt)
-        
-        # Обновляем количество на складе
-        product.stock -= quantity
+    # Добавляем товары в заказ одним пакетным insert
+    await db.execute(
+        insert(order_product),
+        [
+            {
+                "order_id": order.id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "price_at_time": products[product_id].price
+            }
+            for product_id, quantity in lines.items()
+        ]
+    )
     
     # Очищаем корзину
-    for cart_item in cart_items:
-        await db.delete(cart_item)
+    await db.execute(delete(CartItem).where(CartItem.user_id == current_user.id))
+    
+    # Пост-обработка заказа выполняется фоновым воркером после коммита
+    await enqueue(db, "order.created", {"order_id": order.id, "user_id": current_user.id})
+    await enqueue(db, "sales.order_placed", {
+        "order_id": order.id,
+        "day": sales_day(now).isoformat(),
+        "lines": [
+            [product_id, quantity, products[product_id].price]
+            for product_id, quantity in lines.items()
+        ]
+    })
+    
+    # Ответ сохраняется в той же транзакции, что и заказ
+    if idempotency_key is not None:
+        await store_response(
+            db, current_user.id, idempotency_key, OrderSchema.model_validate(order).model_dump(mode="json")
+        )
     
     await db.commit()
-    await db.refresh(order)
     return order
 
 @router.put("/{order_id}", response_model=OrderSchema)
@@ -147,7 +245,7 @@ async def update_order(
     order_id: int,
     order_data: OrderUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_principal)
 ) -> Order:
     """Обновить статус заказа"""
     stmt = select(Order).where(
@@ -178,7 +276,7 @@ async def update_order(
 async def delete_order(
     order_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_principal)
 ) -> None:
     """Отменить заказ"""
     stmt = select(Order).where(
@@ -196,19 +294,93 @@ async def delete_order(
             detail="Order not found"
         )
     
-    # Возвращаем товары на склад
-    for product in order.products:
-        # Получаем количество товара из таблицы order_product
-        stmt = select(order_product).where(
-            and_(
-                order_product.c.order_id == order.id,
-                order_product.c.product_id == product.id
-            )
+    # Возвращаем товары на склад и удаляем позиции одним запросом:
+    # WITH lines AS (DELETE FROM order_product ... RETURNING) UPDATE products ... FROM lines
+    lines = (
+        delete(order_product)
+        .where(order_product.c.order_id == order.id)
+        .returning(order_product.c.product_id, order_product.c.quantity, order_product.c.price_at_time)
+        .cte("lines")
+    )
+    stmt = (
+        update(Product)
+        .where(Product.id == lines.c.product_id)
+        .values(stock=Product.stock + lines.c.quantity)
+        .returning(lines.c.product_id, lines.c.quantity, lines.c.price_at_time)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    returned_lines = [list(row) for row in result.all()]
+    
+    # Внешних ключей на orders нет (таблица партиционирована), поэтому позиции
+    # старой таблицы order_products тоже удаляются явно
+    await db.execute(delete(OrderProduct).where(OrderProduct.order_id == order.id))
+    # Условие на created_at позволяет планировщику отсечь лишние партиции
+    await db.execute(delete(Order).where(Order.id == order.id, Order.created_at == order.created_at))
+    
+    # Отмена попадает в агрегаты продаж как отрицательная дельта
+    if order.created_at is not None and returned_lines:
+        await enqueue(db, "sales.order_cancelled", {
+            "order_id": order.id,
+            "day": sales_day(order.created_at).isoformat(),
+            "lines": returned_lines
+        })
+    await db.commit()
+
+@admin_router.get("/", response_model=Page[OrderSchema])
+async def search_orders(
+    status_: Optional[str] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    min_total: Optional[float] = None,
+    product_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    _: Principal = Depends(get_admin_user)
+) -> Page[OrderSchema]:
+    """
+    Поиск по всем заказам (только для админов), новые сначала.
+    Опирается на индексы (status, created_at), (user_id, created_at) и order_product(product_id);
+    фильтры по created_at отсекают лишние партиции.
+    """
+    stmt = (
+        select(Order)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
+    )
+    if status_ is not None:
+        stmt = stmt.where(Order.status == status_)
+    if created_from is not None:
+        stmt = stmt.where(Order.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Order.created_at < created_to)
+    if user_id is not None:
+        stmt = stmt.where(Order.user_id == user_id)
+    if min_total is not None:
+        stmt = stmt.where(Order.total_amount >= min_total)
+    if product_id is not None:
+        stmt = stmt.where(
+            Order.id.in_(select(order_product.c.order_id).where(order_product.c.product_id == product_id))
         )
-        result = await db.execute(stmt)
-        order_product_data = result.first()
-        if order_product_data:
-            product.stock += order_product_data.quantity
+    if cursor:
+        created_at, order_id = decode_cursor(cursor, datetime, int)
+        # Партиции отсекаются по простому условию на created_at, но не по сравнению строк
+        stmt = stmt.where(
+            Order.created_at <= created_at,
+            tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id)
+        )
+    
+    result = await db.execute(stmt)
+    orders = result.scalars().all()
+    
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1].created_at, orders[-1].id)
     
-    await db.delete(order)
-    await db.commit() 
\ No newline at end of file
+    return Page[OrderSchema](
+        items=[OrderSchema.model_validate(order) for order in orders],
+        next_cursor=next_cursor
+    )
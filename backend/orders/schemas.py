@@ -34,8 +34,11 @@ class Order(OrderBase):
     class Config:
         from_attributes = True
 
+class OrderItem(OrderProductBase):
+    name: Optional[str] = None  # Название товара (может отсутствовать, если товар удален)
+
 class OrderWithProducts(Order):
-    products: List[dict]  # Список продуктов с их количеством и ценой
+    products: List[OrderItem]  # Позиции заказа с количеством и ценой на момент заказа
 
     class Config:
         from_attributes = True 
\ No newline at end of file
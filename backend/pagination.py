@@ -0,0 +1,48 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Generic, List, Optional, TypeVar
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+class Page(BaseModel, Generic[T]):
+    """Страница keyset-пагинации: next_cursor передается в следующий запрос"""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Unsupported cursor value: {value!r}")
+
+def encode_cursor(*values: Any) -> str:
+    """Упаковать значения ключа сортировки последней строки в непрозрачный курсор"""
+    raw = json.dumps(values, default=_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types: type) -> tuple:
+    """
+    Распаковать курсор, приводя значения к указанным типам
+    (datetime восстанавливается из ISO-строки).
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(types):
+            raise ValueError("cursor length mismatch")
+        return tuple(
+            datetime.fromisoformat(value) if type_ is datetime else type_(value)
+            for value, type_ in zip(values, types)
+        )
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
@@ -1,11 +1,12 @@
-from typing import List, Annotated
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from database import get_db
-from models import Product, Category, Supplier, User
-from auth.security import get_current_active_user
+from database import get_db, get_read_db
+from models import Product, Category, Supplier
+from auth.security import Principal, get_admin_user
+from suppliers.analytics import supplier_analytics_cache
 from .schemas import (
     ProductCreate,
     ProductUpdate,
@@ -14,20 +15,10 @@ from .schemas import (
 
 router = APIRouter(prefix="/products", tags=["products"])
 
-async def get_admin_user(
-    current_user: Annotated[User, Depends(get_current_active_user)]
-) -> User:
-    if not current_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    return current_user
-
 @router.get("/", response_model=List[ProductSchema])
 async def get_products(
     category_id: int | None = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> List[Product]:
     """Получить список всех продуктов с возможностью фильтрации по категории"""
     stmt = select(Product)
@@ -39,7 +30,7 @@ async def get_products(
 @router.get("/{product_id}", response_model=ProductSchema)
 async def get_product(
     product_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Product:
     """Получить информацию о конкретном продукте"""
     stmt = select(Product).where(Product.id == product_id)
@@ -57,7 +48,7 @@ async def get_product(
 async def create_product(
     product_data: ProductCreate,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: Principal = Depends(get_admin_user)
 ) -> Product:
     """Создать новый продукт (только для админов)"""
     # Проверяем существование категории
@@ -90,6 +81,7 @@ async def create_product(
     product = Product(**product_data.model_dump())
     db.add(product)
     await db.commit()
+    supplier_analytics_cache.clear()
     await db.refresh(product)
     return product
 
@@ -98,7 +90,7 @@ async def update_product(
     product_id: int,
     product_data: ProductUpdate,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: Principal = Depends(get_admin_user)
 ) -> Product:
     """Обновить информацию о продукте (только для админов)"""
     stmt = select(Product).where(Product.id == product_id)
@@ -147,6 +139,7 @@ async def update_product(
         setattr(product, key, value)
     
     await db.commit()
+    supplier_analytics_cache.clear()
     await db.refresh(product)
     return product
 
@@ -154,7 +147,7 @@ async def update_product(
 async def delete_product(
     product_id: int,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: Principal = Depends(get_admin_user)
 ) -> None:
     """Удалить продукт (только для админов)"""
     stmt = select(Product).where(Product.id == product_id)
@@ -168,4 +161,5 @@ async def delete_product(
         )
     
     await db.delete(product)
-    await db.commit() 
\ No newline at end of file
+    await db.commit()
+    supplier_analytics_cache.clear()
\ No newline at end of file
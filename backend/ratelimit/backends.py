@@ -0,0 +1,44 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Tuple
+
+class RateLimitBackend(ABC):
+    """
+    Хранилище корзин токенов. Общий для всех процессов бэкенд (например,
+    на Redis) реализует тот же метод атомарно на своей стороне.
+    """
+
+    @abstractmethod
+    async def consume(self, key: str, rate: float, burst: int) -> float:
+        """
+        Списать один токен из корзины key (пополняется на rate токенов в секунду,
+        вмещает не больше burst). Возвращает 0, если запрос разрешен, иначе
+        сколько секунд ждать до появления токена.
+        """
+
+class InMemoryBackend(RateLimitBackend):
+    """
+    Корзины в памяти процесса — замена общему бэкенду для одного процесса
+    и разработки. Лимиты действуют на каждый процесс отдельно.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def consume(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - updated) * rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        # Самые давно не обращавшиеся ключи вытесняются: их корзины и так полны
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
@@ -0,0 +1,143 @@
+import json
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .backends import RateLimitBackend, InMemoryBackend
+
+# Тело запроса читается для ключа по username не дальше этого размера
+MAX_BODY_BYTES = 16 * 1024
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    name: str
+    rate: float  # токенов в секунду
+    burst: int   # емкость корзины
+    key: str = "ip"  # "ip" или "username" из тела запроса
+
+def per_minute(name: str, requests: int, key: str = "ip", burst: Optional[int] = None) -> RateLimitPolicy:
+    return RateLimitPolicy(name=name, rate=requests / 60, burst=burst or requests, key=key)
+
+# Политики по (метод, путь). Для входа лимит по username защищает учетную
+# запись от перебора с многих адресов, лимит по IP — от перебора учетных записей
+ROUTE_POLICIES: Dict[Tuple[str, str], List[RateLimitPolicy]] = {
+    ("POST", "/auth/token"): [
+        per_minute("login-ip", 20),
+        per_minute("login-username", 5, key="username"),
+    ],
+    ("POST", "/auth/register"): [
+        per_minute("register-ip", 5),
+    ],
+    ("POST", "/auth/refresh"): [
+        per_minute("refresh-ip", 60),
+    ],
+}
+
+# Сколько запросов отклонено по каждой политике
+rejections: Dict[str, int] = defaultdict(int)
+
+class RateLimitMiddleware:
+    """
+    ASGI-middleware с корзинами токенов. Стоит перед маршрутизацией, поэтому
+    отклоненный запрос не доходит ни до базы, ни до хеширования паролей.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        backend: Optional[RateLimitBackend] = None,
+        policies: Optional[Dict[Tuple[str, str], List[RateLimitPolicy]]] = None,
+        trust_forwarded_for: bool = False
+    ):
+        self.app = app
+        self.backend = backend or InMemoryBackend()
+        self.policies = ROUTE_POLICIES if policies is None else policies
+        self.trust_forwarded_for = trust_forwarded_for
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        policies = self.policies.get((scope["method"], scope["path"].rstrip("/") or "/"))
+        if not policies:
+            await self.app(scope, receive, send)
+            return
+
+        username = None
+        if any(policy.key == "username" for policy in policies):
+            body, messages = await _read_body(receive)
+            username = _extract_username(scope, body)
+            receive = _replay(messages, receive)
+
+        ip = self._client_ip(scope)
+        for policy in policies:
+            value = ip if policy.key == "ip" else username
+            if value is None:
+                continue
+            wait = await self.backend.consume(f"{policy.name}:{value}", policy.rate, policy.burst)
+            if wait > 0:
+                rejections[policy.name] += 1
+                response = JSONResponse(
+                    {"detail": "Too many requests"},
+                    status_code=429,
+                    headers={"Retry-After": str(math.ceil(wait))}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+    def _client_ip(self, scope: Scope) -> str:
+        if self.trust_forwarded_for:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+async def _read_body(receive: Receive) -> Tuple[bytes, List[Message]]:
+    """Прочитать начало тела, сохранив сообщения для повторной отдачи приложению"""
+    messages: List[Message] = []
+    body = b""
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        body += message.get("body", b"")
+        if not message.get("more_body") or len(body) > MAX_BODY_BYTES:
+            break
+    return body, messages
+
+def _replay(messages: List[Message], receive: Receive) -> Receive:
+    async def replayed() -> Message:
+        if messages:
+            return messages.pop(0)
+        return await receive()
+    return replayed
+
+def _extract_username(scope: Scope, body: bytes) -> Optional[str]:
+    """username из формы OAuth2 или JSON-тела; None, если его нет или тело не разобрать"""
+    if len(body) > MAX_BODY_BYTES:
+        return None
+    content_type = b""
+    for name, value in scope.get("headers", []):
+        if name == b"content-type":
+            content_type = value
+            break
+    try:
+        if content_type.startswith(b"application/x-www-form-urlencoded"):
+            username = parse_qs(body.decode())["username"][0]
+        elif content_type.startswith(b"application/json"):
+            username = json.loads(body)["username"]
+        else:
+            return None
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+    if not isinstance(username, str):
+        return None
+    return username.strip().lower() or None
@@ -1,70 +1,163 @@
-from typing import List, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Annotated, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 
-from database import get_db
-from models import Review, Product, User
-from auth.security import get_current_active_user
-from .schemas import ReviewCreate, ReviewUpdate, Review as ReviewSchema
+from database import get_db, get_read_db
+from pagination import Page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from models import Review, ProductRatingStats
+from auth.security import Principal, get_current_active_principal
+from .schemas import ReviewCreate, ReviewUpdate, ReviewListItem, RatingSummary, Review as ReviewSchema
+from .stats import adjust_rating_stats, rating_stats_increment, RATINGS
 
 router = APIRouter(prefix="/reviews", tags=["reviews"])
 
-@router.get("/product/{product_id}", response_model=List[ReviewSchema])
+# Длина начала комментария, которое отдается в списке отзывов
+EXCERPT_LENGTH = 280
+
+@router.get("/product/{product_id}", response_model=Page[ReviewListItem])
 async def get_product_reviews(
     product_id: int,
-    db: AsyncSession = Depends(get_db)
-) -> List[Review]:
-    """Получить все отзывы для продукта"""
-    stmt = select(Review).where(Review.product_id == product_id)
-    result = await db.execute(stmt)
-    return result.scalars().all()
+    sort: Literal["newest", "highest", "lowest"] = "newest",
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+) -> Page[ReviewListItem]:
+    """
+    Получить отзывы для продукта постранично (курсорная пагинация).
+    Сортировки опираются на индексы (product_id, created_at, id) и (product_id, rating, created_at, id).
+    """
+    stmt = select(
+        Review.id,
+        Review.user_id,
+        Review.product_id,
+        Review.rating,
+        # comment и updated_at в таблице допускают NULL
+        func.coalesce(func.left(Review.comment, EXCERPT_LENGTH), "").label("comment_excerpt"),
+        func.coalesce(func.char_length(Review.comment) > EXCERPT_LENGTH, False).label("comment_truncated"),
+        Review.created_at,
+        func.coalesce(Review.updated_at, Review.created_at).label("updated_at")
+    ).where(Review.product_id == product_id)
+    if rating is not None:
+        stmt = stmt.where(Review.rating == rating)
+    
+    if sort == "newest":
+        key = (Review.created_at, Review.id)
+        if cursor:
+            stmt = stmt.where(tuple_(*key) < tuple_(*decode_cursor(cursor, datetime, int)))
+        stmt = stmt.order_by(Review.created_at.desc(), Review.id.desc())
+    else:
+        key = (Review.rating, Review.created_at, Review.id)
+        if cursor:
+            position = tuple_(*decode_cursor(cursor, int, datetime, int))
+            stmt = stmt.where(tuple_(*key) < position if sort == "highest" else tuple_(*key) > position)
+        if sort == "highest":
+            stmt = stmt.order_by(Review.rating.desc(), Review.created_at.desc(), Review.id.desc())
+        else:
+            stmt = stmt.order_by(Review.rating, Review.created_at, Review.id)
+    
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = result.all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if sort == "newest":
+            next_cursor = encode_cursor(last.created_at, last.id)
+        else:
+            next_cursor = encode_cursor(last.rating, last.created_at, last.id)
+    
+    return Page[ReviewListItem](
+        items=[ReviewListItem.model_validate(row._asdict()) for row in rows],
+        next_cursor=next_cursor
+    )
+
+@router.get("/product/{product_id}/summary", response_model=RatingSummary)
+async def get_product_rating_summary(
+    product_id: int,
+    db: AsyncSession = Depends(get_read_db)
+) -> RatingSummary:
+    """Распределение оценок и средний рейтинг товара (из счетчиков, без чтения отзывов)"""
+    stats = await db.get(ProductRatingStats, product_id)
+    histogram = {rating: getattr(stats, f"rating_{rating}") if stats else 0 for rating in RATINGS}
+    review_count = stats.review_count if stats else 0
+    return RatingSummary(
+        product_id=product_id,
+        review_count=review_count,
+        average_rating=round(stats.rating_sum / review_count, 2) if review_count else None,
+        histogram=histogram
+    )
+
+@router.get("/{review_id}", response_model=ReviewSchema)
+async def get_review(
+    review_id: int,
+    db: AsyncSession = Depends(get_read_db)
+) -> Review:
+    """Получить отзыв с полным текстом комментария"""
+    review = await db.get(Review, review_id)
+    if review is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Review not found"
+        )
+    return review
 
 @router.post("/", response_model=ReviewSchema)
 async def create_review(
     review_data: ReviewCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: Annotated[User, Depends(get_current_active_user)] = None
-) -> Review:
+    current_user: Annotated[Principal, Depends(get_current_active_principal)] = None
+) -> dict:
     """Создать новый отзыв"""
-    # Проверяем существование продукта
-    stmt = select(Product).where(Product.id == review_data.product_id)
-    result = await db.execute(stmt)
-    if not result.scalar_one_or_none():
+    # Один запрос: вставка отзыва и обновление счетчиков оценок.
+    # Повторный отзыв отсекает уникальный индекс (user_id, product_id),
+    # несуществующий товар — внешний ключ.
+    now = datetime.utcnow()
+    inserted = (
+        pg_insert(Review)
+        .values(
+            user_id=current_user.id,
+            product_id=review_data.product_id,
+            rating=review_data.rating,
+            comment=review_data.comment,
+            created_at=now,
+            updated_at=now
+        )
+        .on_conflict_do_nothing(index_elements=[Review.user_id, Review.product_id])
+        .returning(*Review.__table__.c)
+        .cte("inserted")
+    )
+    stmt = select(inserted).add_cte(rating_stats_increment(inserted).cte("stats"))
+    try:
+        result = await db.execute(stmt)
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Product not found"
         )
+    review = result.mappings().first()
     
-    # Проверяем, не оставлял ли пользователь уже отзыв на этот продукт
-    stmt = select(Review).where(
-        Review.user_id == current_user.id,
-        Review.product_id == review_data.product_id
-    )
-    result = await db.execute(stmt)
-    if result.scalar_one_or_none():
+    if review is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You have already reviewed this product"
         )
     
-    review = Review(
-        user_id=current_user.id,
-        product_id=review_data.product_id,
-        rating=review_data.rating,
-        comment=review_data.comment
-    )
-    db.add(review)
     await db.commit()
-    await db.refresh(review)
-    return review
+    return dict(review)
 
 @router.put("/{review_id}", response_model=ReviewSchema)
 async def update_review(
     review_id: int,
     review_data: ReviewUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: Annotated[User, Depends(get_current_active_user)] = None
+    current_user: Annotated[Principal, Depends(get_current_active_principal)] = None
 ) -> Review:
     """Обновить отзыв"""
     stmt = select(Review).where(
@@ -81,10 +174,15 @@ async def update_review(
         )
     
     # Обновляем только указанные поля
+    old_rating = review.rating
     update_data = review_data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(review, key, value)
     
+    # Счетчики оценок меняются только при смене оценки
+    if review.rating != old_rating:
+        await adjust_rating_stats(db, review.product_id, {old_rating: -1, review.rating: 1})
+    
     await db.commit()
     await db.refresh(review)
     return review
@@ -93,7 +191,7 @@ async def update_review(
 async def delete_review(
     review_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: Annotated[User, Depends(get_current_active_user)] = None
+    current_user: Annotated[Principal, Depends(get_current_active_principal)] = None
 ) -> None:
     """Удалить отзыв"""
     stmt = select(Review).where(
@@ -109,5 +207,6 @@ async def delete_review(
             detail="Review not found"
         )
     
+    await adjust_rating_stats(db, review.product_id, {review.rating: -1})
     await db.delete(review)
     await db.commit() 
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, conint
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 class ReviewBase(BaseModel):
@@ -21,4 +21,21 @@ class Review(ReviewBase):
     updated_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class ReviewListItem(BaseModel):
+    """Отзыв в списке: вместо полного текста — начало комментария"""
+    id: int
+    user_id: int
+    product_id: int
+    rating: int
+    comment_excerpt: str
+    comment_truncated: bool
+    created_at: datetime
+    updated_at: datetime
+
+class RatingSummary(BaseModel):
+    product_id: int
+    review_count: int
+    average_rating: Optional[float] = None
+    histogram: Dict[int, int]  # оценка (1-5) -> количество отзывов
@@ -0,0 +1,76 @@
+import asyncio
+from typing import Dict
+
+from sqlalchemy import select, delete, func, insert, case, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session
+from models import Review, ProductRatingStats
+
+RATINGS = range(1, 6)
+
+COUNTERS = [*(f"rating_{rating}" for rating in RATINGS), "review_count", "rating_sum"]
+
+def _add_on_conflict(stmt):
+    """ON CONFLICT (product_id) DO UPDATE SET counter = counter + excluded.counter"""
+    return stmt.on_conflict_do_update(
+        index_elements=[ProductRatingStats.product_id],
+        set_={
+            name: getattr(ProductRatingStats, name) + stmt.excluded[name]
+            for name in COUNTERS
+        }
+    )
+
+def _stats_upsert(product_id: int, deltas: Dict[int, int]):
+    """
+    INSERT ... ON CONFLICT DO UPDATE для счетчиков оценок.
+    deltas: {оценка: изменение количества}, например {2: -1, 5: 1} при смене оценки.
+    """
+    values = {f"rating_{rating}": deltas.get(rating, 0) for rating in RATINGS}
+    values["review_count"] = sum(deltas.values())
+    values["rating_sum"] = sum(rating * delta for rating, delta in deltas.items())
+    return _add_on_conflict(pg_insert(ProductRatingStats).values(product_id=product_id, **values))
+
+def rating_stats_increment(source):
+    """
+    INSERT ... SELECT, добавляющий по одному отзыву на каждую строку source
+    (нужны колонки product_id и rating). Используется как CTE внутри вставки отзыва.
+    """
+    return _add_on_conflict(pg_insert(ProductRatingStats).from_select(
+        ["product_id", *COUNTERS],
+        select(
+            source.c.product_id,
+            *[case((source.c.rating == rating, 1), else_=0) for rating in RATINGS],
+            literal(1),
+            source.c.rating
+        )
+    ))
+
+async def adjust_rating_stats(db: AsyncSession, product_id: int, deltas: Dict[int, int]) -> None:
+    """Атомарно изменить счетчики оценок товара в текущей транзакции"""
+    deltas = {rating: delta for rating, delta in deltas.items() if delta}
+    if deltas:
+        await db.execute(_stats_upsert(product_id, deltas))
+
+async def rebuild_rating_stats(db: AsyncSession) -> None:
+    """Пересчитать счетчики всех товаров по таблице reviews (для бэкфилла)"""
+    await db.execute(delete(ProductRatingStats))
+    columns = [
+        func.count().filter(Review.rating == rating)
+        for rating in RATINGS
+    ]
+    await db.execute(insert(ProductRatingStats).from_select(
+        ["product_id", *[f"rating_{rating}" for rating in RATINGS], "review_count", "rating_sum"],
+        select(Review.product_id, *columns, func.count(), func.coalesce(func.sum(Review.rating), 0))
+        .where(Review.product_id.is_not(None), Review.rating.between(1, 5))
+        .group_by(Review.product_id)
+    ))
+    await db.commit()
+
+async def _main() -> None:
+    async with async_session() as db:
+        await rebuild_rating_stats(db)
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,71 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    """
+    Параметры подключения к базе из переменных окружения.
+    Размер пула задается на один процесс: при N воркерах uvicorn база видит
+    до N * (pool_size + max_overflow) соединений.
+    """
+    url: str
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float  # сколько ждать свободное соединение, секунд
+    pool_recycle: int  # пересоздавать соединения старше, секунд
+    pool_pre_ping: bool
+    statement_cache_size: int  # кэш подготовленных запросов asyncpg; 0 — для pgbouncer
+    echo: bool
+    replica_url: Optional[str]  # реплика для чтения; без нее все читается с основной базы
+    replica_max_lag: float  # при большем отставании чтение уходит на основную базу, секунд
+    read_your_writes: int  # сколько секунд после записи пользователь читает с основной базы
+
+    @classmethod
+    def from_env(cls) -> "DatabaseSettings":
+        return cls(
+            url=os.getenv("DATABASE_URL", "postgresql+asyncpg://admin:admin123@db:5432/computer_store"),
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            pool_pre_ping=_env_bool("DB_POOL_PRE_PING", True),
+            statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100")),
+            echo=_env_bool("DB_ECHO", False),
+            replica_url=os.getenv("REPLICA_DATABASE_URL") or None,
+            replica_max_lag=float(os.getenv("REPLICA_MAX_LAG", "5")),
+            read_your_writes=int(os.getenv("READ_YOUR_WRITES_SECONDS", "10")),
+        )
+
+database_settings = DatabaseSettings.from_env()
+
+@dataclass(frozen=True)
+class MonitoringSettings:
+    # Сколько раз один и тот же по форме запрос может выполниться за HTTP-запрос,
+    # прежде чем это будет записано в лог как вероятный N+1
+    n_plus_one_threshold: int
+    slow_query_ms: float  # запросы дольше этого попадают в журнал медленных запросов
+    slow_query_explain_rate: float  # доля медленных SELECT, для которых снимается EXPLAIN ANALYZE
+    slow_query_buffer: int  # сколько последних медленных запросов держать в памяти
+    slow_query_log: Optional[str]  # файл журнала (JSON Lines); пусто — только в памяти
+    # Bearer-токен для /metrics; без него /metrics отвечает только адресам из частных сетей
+    metrics_token: Optional[str]
+
+    @classmethod
+    def from_env(cls) -> "MonitoringSettings":
+        return cls(
+            n_plus_one_threshold=int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10")),
+            slow_query_ms=float(os.getenv("SLOW_QUERY_MS", "200")),
+            slow_query_explain_rate=float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0.1")),
+            slow_query_buffer=int(os.getenv("SLOW_QUERY_BUFFER", "500")),
+            slow_query_log=os.getenv("SLOW_QUERY_LOG") or None,
+            metrics_token=os.getenv("METRICS_TOKEN") or None,
+        )
+
+monitoring_settings = MonitoringSettings.from_env()
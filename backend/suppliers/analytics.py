@@ -0,0 +1,65 @@
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import TTLCache
+from models import Product, Supplier, Category
+from .schemas import InventoryAnalytics, InventoryAnalyticsRow
+
+# Сбрасывается при изменении товаров и приеме поставок; TTL ограничивает
+# устаревание из-за продаж и изменений в других процессах
+supplier_analytics_cache = TTLCache("supplier_analytics", maxsize=1, ttl=300)
+
+async def compute_inventory_analytics(db: AsyncSession) -> InventoryAnalytics:
+    """
+    Срезы по поставщикам и категориям одним агрегирующим запросом
+    (GROUP BY GROUPING SETS): число SKU, стоимость остатков по закупке
+    и по рознице, средняя маржа.
+    """
+    margin = (Product.price - Product.supply_price) / func.nullif(Product.price, 0)
+    by_supplier = func.grouping(Product.supplier_id)
+    stmt = (
+        select(
+            by_supplier.label("is_category_row"),
+            Product.supplier_id,
+            Supplier.name.label("supplier_name"),
+            Product.category_id,
+            Category.name.label("category_name"),
+            func.count().label("sku_count"),
+            func.coalesce(func.sum(Product.stock), 0).label("stock_units"),
+            func.coalesce(func.sum(Product.stock * Product.supply_price), 0).label("stock_value_cost"),
+            func.coalesce(func.sum(Product.stock * Product.price), 0).label("stock_value_retail"),
+            func.avg(margin).label("avg_margin"),
+        )
+        .outerjoin(Supplier, Supplier.id == Product.supplier_id)
+        .outerjoin(Category, Category.id == Product.category_id)
+        .group_by(func.grouping_sets(
+            tuple_(Product.supplier_id, Supplier.name),
+            tuple_(Product.category_id, Category.name),
+        ))
+    )
+    result = await db.execute(stmt)
+
+    suppliers, categories = [], []
+    for row in result.all():
+        is_category_row = bool(row.is_category_row)
+        item = InventoryAnalyticsRow(
+            id=row.category_id if is_category_row else row.supplier_id,
+            name=row.category_name if is_category_row else row.supplier_name,
+            sku_count=row.sku_count,
+            stock_units=row.stock_units,
+            stock_value_cost=row.stock_value_cost,
+            stock_value_retail=row.stock_value_retail,
+            avg_margin=row.avg_margin,
+        )
+        (categories if is_category_row else suppliers).append(item)
+
+    suppliers.sort(key=lambda item: item.stock_value_cost, reverse=True)
+    categories.sort(key=lambda item: item.stock_value_cost, reverse=True)
+    return InventoryAnalytics(suppliers=suppliers, categories=categories)
+
+async def get_inventory_analytics(db: AsyncSession) -> InventoryAnalytics:
+    analytics = supplier_analytics_cache.get("all")
+    if analytics is None:
+        analytics = await compute_inventory_analytics(db)
+        supplier_analytics_cache.set("all", analytics)
+    return analytics
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+import numpy as np
+from sqlalchemy import select, delete, insert, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session
+from models import Product, SalesDailyProduct, SupplierDelivery, ReorderSuggestion
+
+logger = logging.getLogger(__name__)
+
+# Окно, по которому считается скорость продаж (дни)
+VELOCITY_WINDOW_DAYS = 28
+# Период истории поставок для оценки срока пополнения (дни)
+LEAD_TIME_HISTORY_DAYS = 180
+# Срок пополнения, если у поставщика меньше двух поставок в истории
+DEFAULT_LEAD_TIME_DAYS = 14.0
+MAX_LEAD_TIME_DAYS = 90.0
+# Запас на сколько дней продаж заказывать сверх точки заказа
+REVIEW_PERIOD_DAYS = 14
+# z-оценка для уровня сервиса ~95% при расчете страхового запаса
+SERVICE_LEVEL_Z = 1.65
+# Как часто пересчитываются рекомендации (в секундах)
+REORDER_INTERVAL = 3600
+
+async def supplier_lead_times(db: AsyncSession) -> Dict[int, float]:
+    """
+    Срок пополнения по поставщику — средний интервал между его поставками
+    (в днях) за LEAD_TIME_HISTORY_DAYS; поставщики с одной поставкой не попадают
+    """
+    since = datetime.utcnow() - timedelta(days=LEAD_TIME_HISTORY_DAYS)
+    previous = func.lag(SupplierDelivery.delivered_at).over(
+        partition_by=SupplierDelivery.supplier_id,
+        order_by=SupplierDelivery.delivered_at
+    )
+    gaps = (
+        select(
+            SupplierDelivery.supplier_id,
+            (func.extract("epoch", SupplierDelivery.delivered_at - previous) / 86400).label("gap_days")
+        )
+        .where(SupplierDelivery.delivered_at >= since)
+        .subquery()
+    )
+    result = await db.execute(
+        select(gaps.c.supplier_id, func.avg(gaps.c.gap_days))
+        .where(gaps.c.gap_days.is_not(None))
+        .group_by(gaps.c.supplier_id)
+    )
+    return {
+        supplier_id: min(max(float(gap_days), 1.0), MAX_LEAD_TIME_DAYS)
+        for supplier_id, gap_days in result.all()
+    }
+
+async def compute_reorder_suggestions(db: AsyncSession) -> int:
+    """
+    Пересчитать таблицу reorder_suggestions для всего каталога.
+    Продажи за окно собираются в матрицу товары x дни из sales_daily_product,
+    скорость и разброс считаются векторно:
+        точка заказа = скорость * срок пополнения + z * σ * √срок пополнения
+    Рекомендация выдается, когда остаток не выше точки заказа.
+    Возвращает число рекомендаций; транзакцию фиксирует вызывающий.
+    """
+    locked = (await db.execute(text(
+        "SELECT pg_try_advisory_xact_lock(hashtext('reorder_suggestions'))"
+    ))).scalar()
+    if not locked:
+        return 0
+
+    result = await db.execute(
+        select(Product.id, Product.supplier_id, func.coalesce(Product.stock, 0))
+        .where(Product.supplier_id.is_not(None))
+        .order_by(Product.id)
+    )
+    products = result.all()
+    await db.execute(delete(ReorderSuggestion))
+    if not products:
+        return 0
+
+    product_ids = np.fromiter((row[0] for row in products), dtype=np.int64, count=len(products))
+    supplier_ids = np.fromiter((row[1] for row in products), dtype=np.int64, count=len(products))
+    stock = np.fromiter((row[2] for row in products), dtype=np.float64, count=len(products))
+
+    # Дни агрегатов продаж — дни UTC
+    today = datetime.now(timezone.utc).date()
+    first_day = today - timedelta(days=VELOCITY_WINDOW_DAYS - 1)
+    result = await db.execute(
+        select(SalesDailyProduct.product_id, SalesDailyProduct.day, SalesDailyProduct.units)
+        .where(SalesDailyProduct.day.between(first_day, today))
+    )
+    sales = result.all()
+
+    units = np.zeros((len(products), VELOCITY_WINDOW_DAYS))
+    if sales:
+        sold_ids = np.fromiter((row[0] for row in sales), dtype=np.int64, count=len(sales))
+        offsets = np.fromiter(((row[1] - first_day).days for row in sales), dtype=np.int64, count=len(sales))
+        sold_units = np.fromiter((row[2] for row in sales), dtype=np.float64, count=len(sales))
+        # product_ids отсортированы — позиция строки находится бинарным поиском
+        rows = np.searchsorted(product_ids, sold_ids)
+        known = (rows < len(product_ids)) & (product_ids[np.minimum(rows, len(product_ids) - 1)] == sold_ids)
+        np.add.at(units, (rows[known], offsets[known]), sold_units[known])
+
+    velocity = units.mean(axis=1)
+    deviation = units.std(axis=1)
+
+    lead_times = await supplier_lead_times(db)
+    lead_time = np.array([lead_times.get(int(s), DEFAULT_LEAD_TIME_DAYS) for s in supplier_ids])
+
+    reorder_point = velocity * lead_time + SERVICE_LEVEL_Z * deviation * np.sqrt(lead_time)
+    target = reorder_point + velocity * REVIEW_PERIOD_DAYS
+    suggested = np.ceil(np.maximum(target - stock, 0))
+    days_of_cover = np.divide(stock, velocity, out=np.zeros_like(stock), where=velocity > 0)
+    due = (velocity > 0) & (stock <= reorder_point) & (suggested > 0)
+
+    computed_at = datetime.utcnow()
+    indexes = np.flatnonzero(due)
+    if indexes.size:
+        await db.execute(insert(ReorderSuggestion), [
+            {
+                "product_id": int(product_ids[i]),
+                "supplier_id": int(supplier_ids[i]),
+                "stock": int(stock[i]),
+                "daily_velocity": float(velocity[i]),
+                "lead_time_days": float(lead_time[i]),
+                "reorder_point": float(reorder_point[i]),
+                "suggested_quantity": int(suggested[i]),
+                "days_of_cover": float(days_of_cover[i]),
+                "computed_at": computed_at,
+            }
+            for i in indexes
+        ])
+    logger.info("Reorder suggestions: %d of %d products", indexes.size, len(products))
+    return int(indexes.size)
+
+async def _main() -> None:
+    async with async_session() as db:
+        await compute_reorder_suggestions(db)
+        await db.commit()
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,44 +1,53 @@
-from typing import List, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, insert, values, column, Integer, Float
 
 from database import get_db
-from models import Supplier, User
-from auth.security import get_current_active_user
+from models import Supplier, SupplierDelivery, SupplierDeliveryLine, ReorderSuggestion, Product
+from auth.security import Principal, get_admin_user
 from .schemas import (
     SupplierCreate,
     SupplierUpdate,
-    Supplier as SupplierSchema
+    Supplier as SupplierSchema,
+    DeliveryCreate,
+    DeliveryLine,
+    DeliveryResult,
+    Delivery as DeliverySchema,
+    InventoryAnalytics,
+    ReorderSuggestion as ReorderSuggestionSchema
 )
+from .analytics import get_inventory_analytics, supplier_analytics_cache
 
 router = APIRouter(prefix="/suppliers", tags=["suppliers"])
 
-async def get_admin_user(
-    current_user: Annotated[User, Depends(get_current_active_user)]
-) -> User:
-    if not current_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    return current_user
-
 @router.get("/", response_model=List[SupplierSchema])
 async def get_suppliers(
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: Principal = Depends(get_admin_user)
 ) -> List[Supplier]:
     """Получить список всех поставщиков (только для админов)"""
     stmt = select(Supplier)
     result = await db.execute(stmt)
     return result.scalars().all()
 
+@router.get("/analytics", response_model=InventoryAnalytics)
+async def get_supplier_analytics(
+    db: AsyncSession = Depends(get_db),
+    _: Principal = Depends(get_admin_user)
+) -> InventoryAnalytics:
+    """
+    Стоимость остатков и маржа в разрезе поставщиков и категорий (только для админов).
+    Результат кэшируется и сбрасывается при изменении товаров и приеме поставок.
+    """
+    return await get_inventory_analytics(db)
+
 @router.get("/{supplier_id}", response_model=SupplierSchema)
 async def get_supplier(
     supplier_id: int,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: Principal = Depends(get_admin_user)
 ) -> Supplier:
     """Получить информацию о поставщике (только для админов)"""
     stmt = select(Supplier).where(Supplier.id == supplier_id)
@@ -56,7 +65,7 @@ async def get_supplier(
 async def create_supplier(
     supplier_data: SupplierCreate,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: Principal = Depends(get_admin_user)
 ) -> Supplier:
     """Создать нового поставщика (только для админов)"""
     # Проверяем уникальность email
@@ -79,7 +88,7 @@ async def update_supplier(
     supplier_id: int,
     supplier_data: SupplierUpdate,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: Principal = Depends(get_admin_user)
 ) -> Supplier:
     """Обновить информацию о поставщике (только для админов)"""
     stmt = select(Supplier).where(Supplier.id == supplier_id)
@@ -115,7 +124,7 @@ async def update_supplier(
 async def delete_supplier(
     supplier_id: int,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_admin_user)
+    _: Principal = Depends(get_admin_user)
 ) -> None:
     """Удалить поставщика (только для админов)"""
     stmt = select(Supplier).where(Supplier.id == supplier_id)
@@ -130,3 +139,132 @@ async def delete_supplier(
     
     await db.delete(supplier)
     await db.commit()
+
+@router.post("/{supplier_id}/deliveries", response_model=DeliveryResult)
+async def create_delivery(
+    supplier_id: int,
+    delivery_data: DeliveryCreate,
+    db: AsyncSession = Depends(get_db),
+    _: Principal = Depends(get_admin_user)
+) -> DeliveryResult:
+    """
+    Принять поставку по накладной (только для админов).
+    Остатки, закупочные цены и дата поставки обновляются одним запросом
+    UPDATE products ... FROM (VALUES ...) только для товаров этого поставщика.
+    """
+    supplier = await db.get(Supplier, supplier_id)
+    if supplier is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Supplier not found"
+        )
+    
+    # Повторяющиеся строки накладной складываются, цена берется из последней
+    lines = {}
+    for line in delivery_data.lines:
+        quantity = lines[line.product_id][0] + line.quantity if line.product_id in lines else line.quantity
+        lines[line.product_id] = (quantity, line.supply_price)
+    delivered_at = delivery_data.delivered_at or datetime.utcnow()
+    
+    manifest = values(
+        column("product_id", Integer),
+        column("quantity", Integer),
+        column("supply_price", Float),
+        name="manifest"
+    ).data([(product_id, quantity, price) for product_id, (quantity, price) in lines.items()])
+    stmt = (
+        update(Product)
+        .where(Product.id == manifest.c.product_id, Product.supplier_id == supplier_id)
+        .values(
+            stock=Product.stock + manifest.c.quantity,
+            supply_price=manifest.c.supply_price,
+            last_supply_date=delivered_at
+        )
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    matched = set(result.scalars().all())
+    
+    delivery = SupplierDelivery(
+        supplier_id=supplier_id,
+        delivered_at=delivered_at,
+        line_count=len(lines),
+        matched_count=len(matched),
+        total_cost=sum(quantity * price for product_id, (quantity, price) in lines.items() if product_id in matched),
+        created_at=datetime.utcnow()
+    )
+    db.add(delivery)
+    await db.flush()
+    if matched:
+        await db.execute(insert(SupplierDeliveryLine), [
+            {"delivery_id": delivery.id, "product_id": product_id, "quantity": quantity, "supply_price": price}
+            for product_id, (quantity, price) in lines.items()
+            if product_id in matched
+        ])
+    await db.commit()
+    supplier_analytics_cache.clear()
+    
+    return DeliveryResult(
+        id=delivery.id,
+        supplier_id=supplier_id,
+        delivered_at=delivered_at,
+        line_count=delivery.line_count,
+        matched_count=delivery.matched_count,
+        total_cost=delivery.total_cost,
+        unmatched=[
+            DeliveryLine(product_id=product_id, quantity=quantity, supply_price=price)
+            for product_id, (quantity, price) in lines.items()
+            if product_id not in matched
+        ]
+    )
+
+@router.get("/{supplier_id}/deliveries", response_model=List[DeliverySchema])
+async def get_deliveries(
+    supplier_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    _: Principal = Depends(get_admin_user)
+) -> List[SupplierDelivery]:
+    """История поставок поставщика, последние сначала (только для админов)"""
+    stmt = (
+        select(SupplierDelivery)
+        .where(SupplierDelivery.supplier_id == supplier_id)
+        .order_by(SupplierDelivery.delivered_at.desc())
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+@router.get("/{supplier_id}/reorder-suggestions", response_model=List[ReorderSuggestionSchema])
+async def get_reorder_suggestions(
+    supplier_id: int,
+    db: AsyncSession = Depends(get_db),
+    _: Principal = Depends(get_admin_user)
+) -> List[ReorderSuggestionSchema]:
+    """
+    Товары поставщика, которые пора дозаказать, — сначала те, чей остаток
+    закончится раньше (только для админов). Рекомендации пересчитываются
+    периодически по скорости продаж и интервалам между поставками.
+    """
+    stmt = (
+        select(ReorderSuggestion, Product.name)
+        .join(Product, Product.id == ReorderSuggestion.product_id)
+        .where(ReorderSuggestion.supplier_id == supplier_id)
+        .order_by(ReorderSuggestion.days_of_cover, ReorderSuggestion.product_id)
+    )
+    result = await db.execute(stmt)
+    return [
+        ReorderSuggestionSchema(
+            product_id=suggestion.product_id,
+            product_name=name,
+            stock=suggestion.stock,
+            daily_velocity=suggestion.daily_velocity,
+            lead_time_days=suggestion.lead_time_days,
+            reorder_point=suggestion.reorder_point,
+            suggested_quantity=suggestion.suggested_quantity,
+            days_of_cover=suggestion.days_of_cover,
+            computed_at=suggestion.computed_at
+        )
+        for suggestion, name in result.all()
+    ]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, confloat
+from pydantic import BaseModel, EmailStr, Field, confloat, conint
 from typing import Optional, List
 from datetime import datetime
 
@@ -50,4 +50,58 @@ class SupplierWithProducts(Supplier):
     products: List[ProductSupplier]
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class DeliveryLine(BaseModel):
+    product_id: int
+    quantity: conint(gt=0)
+    supply_price: confloat(gt=0)
+
+class DeliveryCreate(BaseModel):
+    delivered_at: Optional[datetime] = None  # По умолчанию — момент приема накладной
+    lines: List[DeliveryLine] = Field(min_length=1)
+
+class DeliveryResult(BaseModel):
+    id: int
+    supplier_id: int
+    delivered_at: datetime
+    line_count: int
+    matched_count: int
+    total_cost: float
+    unmatched: List[DeliveryLine]  # Строки, не найденные среди товаров поставщика
+
+class Delivery(BaseModel):
+    id: int
+    supplier_id: int
+    delivered_at: datetime
+    line_count: int
+    matched_count: int
+    total_cost: float
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class InventoryAnalyticsRow(BaseModel):
+    id: Optional[int]  # None — товары без поставщика или категории
+    name: Optional[str]
+    sku_count: int
+    stock_units: int
+    stock_value_cost: float  # Остатки по закупочной цене
+    stock_value_retail: float  # Остатки по розничной цене
+    avg_margin: Optional[float]  # Средняя доля наценки в розничной цене
+
+class InventoryAnalytics(BaseModel):
+    suppliers: List[InventoryAnalyticsRow]
+    categories: List[InventoryAnalyticsRow]
+
+class ReorderSuggestion(BaseModel):
+    product_id: int
+    product_name: str
+    stock: int
+    daily_velocity: float
+    lead_time_days: float
+    reorder_point: float
+    suggested_quantity: int
+    days_of_cover: float
+    computed_at: datetime
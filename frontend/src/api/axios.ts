@@ -1,4 +1,4 @@
-import axios from "axios";
+import axios, { InternalAxiosRequestConfig } from "axios";
 
 // Можно доработать получение токена (например, из localStorage)
 const getToken = () => localStorage.getItem("token");
@@ -17,4 +17,43 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// Один запрос обновления на все одновременно получившие 401: refresh-токен
+// одноразовый, и параллельный повтор сервер примет за его кражу
+let refreshing: Promise<string | null> | null = null;
+
+const refreshAccessToken = async (): Promise<string | null> => {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) return null;
+  try {
+    const res = await axios.post(`${api.defaults.baseURL}/auth/refresh`, {
+      refresh_token: refreshToken,
+    });
+    localStorage.setItem("token", res.data.access_token);
+    localStorage.setItem("refresh_token", res.data.refresh_token);
+    return res.data.access_token;
+  } catch {
+    localStorage.removeItem("token");
+    localStorage.removeItem("refresh_token");
+    return null;
+  }
+};
+
+api.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const config = error.config as (InternalAxiosRequestConfig & { _retried?: boolean }) | undefined;
+    const isLogin = config?.url === "/auth/token" || config?.url === "/auth/logout";
+    if (error.response?.status !== 401 || !config || config._retried || isLogin) {
+      return Promise.reject(error);
+    }
+    refreshing = refreshing || refreshAccessToken().finally(() => {
+      refreshing = null;
+    });
+    const token = await refreshing;
+    if (!token) return Promise.reject(error);
+    config._retried = true;
+    return api(config);
+  }
+);
+
 export default api;
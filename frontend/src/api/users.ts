@@ -9,7 +9,14 @@ export interface User {
     created_at: string;
 }
 
-export const getUsers = async (): Promise<User[]> => {
-    const response = await axios.get<User[]>('/auth/users');
+export interface UsersPage {
+    items: User[];
+    next_cursor: string | null;
+}
+
+export const getUsers = async (cursor?: string | null): Promise<UsersPage> => {
+    const response = await axios.get<UsersPage>('/auth/users', {
+        params: cursor ? { cursor } : undefined,
+    });
     return response.data;
 }; 
\ No newline at end of file
@@ -4,23 +4,25 @@ import { getUsers } from '../../api/users';
 
 export const UsersList = () => {
     const [users, setUsers] = useState<User[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
 
-    useEffect(() => {
-        const fetchUsers = async () => {
-            try {
-                const data = await getUsers();
-                setUsers(data);
-                setError(null);
-            } catch (err) {
-                setError('Ошибка при загрузке пользователей');
-                console.error(err);
-            } finally {
-                setLoading(false);
-            }
-        };
+    const fetchUsers = async (cursor?: string | null) => {
+        try {
+            const page = await getUsers(cursor);
+            setUsers((prev) => (cursor ? [...prev, ...page.items] : page.items));
+            setNextCursor(page.next_cursor);
+            setError(null);
+        } catch (err) {
+            setError('Ошибка при загрузке пользователей');
+            console.error(err);
+        } finally {
+            setLoading(false);
+        }
+    };
 
+    useEffect(() => {
         fetchUsers();
     }, []);
 
@@ -93,6 +95,16 @@ export const UsersList = () => {
                     </tbody>
                 </table>
             </div>
+            {nextCursor && (
+                <div className="flex justify-center mt-4">
+                    <button
+                        onClick={() => fetchUsers(nextCursor)}
+                        className="px-4 py-2 bg-blue-600 text-white rounded hover:bg-blue-700"
+                    >
+                        Загрузить еще
+                    </button>
+                </div>
+            )}
         </div>
     );
 }; 
\ No newline at end of file
@@ -102,6 +102,17 @@ const OrderAdminSection: React.FC = observer(() => {
           </div>
         ))}
       </div>
+      {orderStore.nextCursor && (
+        <div className="flex justify-center mt-4">
+          <button
+            onClick={() => orderStore.fetchOrders(orderStore.nextCursor)}
+            className="px-4 py-2 bg-violet-600 text-white rounded-lg hover:bg-violet-700 transition"
+            disabled={orderStore.loading}
+          >
+            Загрузить еще
+          </button>
+        </div>
+      )}
     </div>
   );
 });
@@ -19,6 +19,7 @@ export interface IOrder {
 
 class OrderStore {
   orders: IOrder[] = [];
+  nextCursor: string | null = null;
   loading = false;
   error: string | null = null;
 
@@ -26,13 +27,15 @@ class OrderStore {
     makeAutoObservable(this);
   }
 
-  async fetchOrders() {
+  // Без cursor загружает первую страницу заново, с cursor — дописывает следующую
+  async fetchOrders(cursor?: string | null) {
     this.loading = true;
     this.error = null;
     try {
-      const res = await api.get("/orders");
+      const res = await api.get("/orders", { params: cursor ? { cursor } : {} });
       runInAction(() => {
-        this.orders = res.data;
+        this.orders = cursor ? [...this.orders, ...res.data.items] : res.data.items;
+        this.nextCursor = res.data.next_cursor;
       });
     } catch (e: any) {
       runInAction(() => {
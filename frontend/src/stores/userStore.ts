@@ -34,6 +34,7 @@ class UserStore {
         this.token = res.data.access_token;
         this.isAuth = true;
         localStorage.setItem("token", this.token!);
+        localStorage.setItem("refresh_token", res.data.refresh_token);
       });
       await this.fetchUser();
     } catch (e: any) {
@@ -64,6 +65,7 @@ class UserStore {
         this.isAuth = false;
         this.token = null;
         localStorage.removeItem("token");
+        localStorage.removeItem("refresh_token");
       });
     } finally {
       runInAction(() => {
@@ -73,10 +75,20 @@ class UserStore {
   }
 
   logout() {
+    const refreshToken = localStorage.getItem("refresh_token");
+    if (this.token) {
+      // Отзыв на сервере не должен задерживать выход
+      api
+        .post("/auth/logout", refreshToken ? { refresh_token: refreshToken } : undefined, {
+          headers: { Authorization: `Bearer ${this.token}` },
+        })
+        .catch(() => {});
+    }
     this.user = null;
     this.token = null;
     this.isAuth = false;
     localStorage.removeItem("token");
+    localStorage.removeItem("refresh_token");
   }
 }
 